@@ -0,0 +1,214 @@
+'''
+Our messages aren't really fixed strings like 'Your order has
+been processed'.  They are templates, filled in for every order
+and in every customer's language:
+
+	'Hi {name}, order {order_id} has been processed'
+
+And then every notifier wraps that in its own text with
+'This is a text message: {}'.format(message).  When a big wave
+of orders goes out, that is two format() calls per notifier
+per order, and every one reads through the template again
+looking for the {} parts, even though the template never changes.
+
+So we are going to compile templates once.  Order will still
+only know about the NotifierInterface, and the MultiNotifier
+decorator from example 3 still lets one Order use many notifiers.
+
+First, every notifier now says what its wrapper text is, and has
+a deliver() method for text that is already finished.  notify()
+still works just like before, it formats the wrapper and
+delivers.
+
+CompiledTemplate reads through a template ONCE and turns
+'Hi {name}' into 'Hi %s', remembering that the first %s is name.
+Filling a %s string from a tuple is about as fast as python can
+build a string.  Templates with fancy fields like {total:.2f} or
+{user.name} just fall back to format_map().
+
+The TemplateEngine folds each notifier's wrapper into the
+localized template and compiles the result, so a message is
+built in a single step.  compile() is cached by
+(template, locale, notifier), so each combination is only ever
+compiled once.
+
+The NotifierInterface gets one more method, notify_template().
+Instead of a finished message, Order hands it the engine, the
+template name, the customer's locale and the values to fill in.
+By default a notifier asks the engine for its own compiled
+version of the template and delivers the result.  MultiNotifier
+just passes the call on to each of its notifiers, exactly like it
+does with notify(), so every notifier still gets its own wrapper.
+Order calls notify_template() on whatever NotifierInterface it
+was given, and never needs to know which notifiers are behind it.
+
+channels() lists the single notifiers behind a notifier (a
+MultiNotifier lists its children's).  notify_orders() uses it to
+take a whole wave of orders, group them by locale and notifier,
+and render each group with one compiled template.
+render_orders() does the rendering without delivering, so main()
+can time it without printing 300000 lines.
+'''
+
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from itertools import repeat
+from operator import itemgetter
+from string import Formatter
+import time
+
+class NotifierInterface(ABC):
+	wrapper:str = '{}'
+
+	@abstractmethod
+	def deliver(self, text:str)->None:pass
+
+	def notify(self, message:str)->None:
+		self.deliver(self.wrapper.format(message))
+
+	def notify_template(self, engine:'TemplateEngine', template:str, locale:str, values:dict)->None:
+		self.deliver(engine.compile(template, locale, type(self)).render(values))
+
+	def channels(self)->list['NotifierInterface']:
+		return [self]
+
+class TextNotifier(NotifierInterface):
+	wrapper = 'This is a text message: {}'
+
+	def deliver(self, text:str)->None:
+		print(text)
+
+class EmailNotifier(NotifierInterface):
+	wrapper = 'This is an email: {}'
+
+	def deliver(self, text:str)->None:
+		print(text)
+
+class FacebookNotifier(NotifierInterface):
+	wrapper = 'This is an Facebook message: {}'
+
+	def deliver(self, text:str)->None:
+		print(text)
+
+class CompiledTemplate:
+	def __init__(self, source:str):
+		self.source = source
+		pieces = list(Formatter().parse(source))
+		fields = [field for _, field, _, _ in pieces if field is not None]
+		simple = all(
+			(field is None or field.isidentifier()) and not spec and conversion is None
+			for _, field, spec, conversion in pieces
+		)
+
+		if simple and fields:
+			self._format = ''.join(
+				literal.replace('%', '%%') + ('%s' if field is not None else '')
+				for literal, field, _, _ in pieces
+			)
+			getter = itemgetter(*fields)
+			self._values = getter if len(fields) > 1 else lambda values: (getter(values),)
+		else:
+			self._format = None
+
+	def render(self, values:dict)->str:
+		if self._format is None:
+			return self.source.format_map(values)
+		return self._format % self._values(values)
+
+	def render_many(self, values:list[dict])->list[str]:
+		if self._format is None:
+			return [self.source.format_map(value) for value in values]
+		format, get = self._format, self._values
+		return [format % get(value) for value in values]
+
+class TemplateEngine:
+	def __init__(self, cache_size:int=1024):
+		self._templates:dict[tuple[str, str], str] = {}
+		self.compile = lru_cache(maxsize=cache_size)(self._compile)
+
+	def register(self, name:str, locale:str, text:str)->None:
+		self._templates[(name, locale)] = text
+		self.compile.cache_clear()
+
+	def _compile(self, name:str, locale:str, notifier:type)->CompiledTemplate:
+		text = self._templates.get((name, locale))
+		if text is None:
+			raise ValueError('no template {} for {}'.format(name, locale))
+		return CompiledTemplate(notifier.wrapper.format(text))
+
+class MultiNotifier(NotifierInterface):
+	def __init__(self, notifiers:list[NotifierInterface]):
+		self._notifiers = notifiers
+
+	def deliver(self, text:str)->None:
+		for notifier in self._notifiers:
+			notifier.deliver(text)
+
+	def notify(self, message:str)->None:
+		for notifier in self._notifiers:
+			notifier.notify(message)
+
+	def notify_template(self, engine:TemplateEngine, template:str, locale:str, values:dict)->None:
+		for notifier in self._notifiers:
+			notifier.notify_template(engine, template, locale, values)
+
+	def channels(self)->list[NotifierInterface]:
+		return [channel for notifier in self._notifiers for channel in notifier.channels()]
+
+class Order:
+	def __init__(self, order_id:int, name:str, locale:str, notifier:NotifierInterface, engine:TemplateEngine):
+		self.order_id = order_id
+		self.name = name
+		self.locale = locale
+		self.notifier = notifier
+		self.engine = engine
+
+	def values(self)->dict:
+		return {'name': self.name, 'order_id': self.order_id}
+
+	def process_order(self)->None:
+		#do other order processing stuff
+		self.notifier.notify_template(self.engine, 'processed', self.locale, self.values())
+
+def render_orders(engine:TemplateEngine, template:str, orders:list[Order])->list[tuple[NotifierInterface, str]]:
+	groups:dict[tuple[str, NotifierInterface], list[dict]] = {}
+	for order in orders:
+		values = order.values()
+		for notifier in order.notifier.channels():
+			groups.setdefault((order.locale, notifier), []).append(values)
+
+	rendered = []
+	for (locale, notifier), group in groups.items():
+		compiled = engine.compile(template, locale, type(notifier))
+		rendered.extend(zip(repeat(notifier), compiled.render_many(group)))
+	return rendered
+
+def notify_orders(engine:TemplateEngine, template:str, orders:list[Order])->None:
+	for notifier, text in render_orders(engine, template, orders):
+		notifier.deliver(text)
+
+def main():
+	engine = TemplateEngine()
+	engine.register('processed', 'en', 'Hi {name}, order {order_id} has been processed')
+	engine.register('processed', 'es', 'Hola {name}, el pedido {order_id} ha sido procesado')
+	notifiers = [TextNotifier(), EmailNotifier(), FacebookNotifier()]
+	multi:MultiNotifier = MultiNotifier(notifiers)
+
+	Order(1, 'Jake', 'en', multi, engine).process_order()
+	Order(2, 'Ana', 'es', multi, engine).process_order()
+
+	#a big wave of orders, the old way and then compiled and batched
+	orders = [Order(i, 'Customer {}'.format(i), 'en' if i % 2 else 'es', multi, engine) for i in range(100000)]
+	texts = {'en': 'Hi {name}, order {order_id} has been processed', 'es': 'Hola {name}, el pedido {order_id} ha sido procesado'}
+
+	start = time.perf_counter()
+	naive = [(notifier, notifier.wrapper.format(texts[order.locale].format(**order.values()))) for order in orders for notifier in notifiers]
+	print('format() every time: {} messages in {:.3f}s'.format(len(naive), time.perf_counter() - start))
+
+	start = time.perf_counter()
+	rendered = render_orders(engine, 'processed', orders)
+	print('compiled and batched: {} messages in {:.3f}s'.format(len(rendered), time.perf_counter() - start))
+	print(engine.compile.cache_info())
+
+if __name__ == "__main__":
+	main()
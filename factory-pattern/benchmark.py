@@ -0,0 +1,122 @@
+import importlib
+import itertools
+import random
+import sys
+import time
+import tracemalloc
+
+'''
+We have a handful of different factories now, and each one
+claims to be faster than the last.  This benchmark checks
+those claims with numbers.
+
+It builds a synthetic population of users.  Every user gets a
+random, non-empty combination of notification preferences, so
+all 7 combinations show up, and the population can be limited
+to users with a certain number of channels.  Then it creates an
+Order for every user, with each of these factories:
+
+	example6 NotificationFactory - the original if/elif chain
+	example6 MultiNotificationFactory - if/elif, a new composite every time
+	example7 NotificationFactory - registry lookup, shared channels
+	example7 MultiNotificationFactory - registry lookup, new composite
+	example8 MultiNotificationFactory - registry, memoized composites
+	example11 lazy Order - if/elif, but only resolved when needed
+
+For every factory it reports:
+
+	ops/sec - Orders created per second
+	peak B/op - the most memory tracemalloc saw allocated while
+		creating one Order, temporary objects included.  This is
+		the allocation volume, it shows the lists and objects an
+		if/elif factory builds and throws away again.
+	kept B/op - how much of that is still held afterwards.  This
+		counts the Order itself too, so the interesting part is
+		the difference between rows.
+
+tracemalloc makes every allocation slower, so the timing run is
+done without it, and the memory columns come from creating the
+first 2000 Orders again, one at a time, with tracing on.
+
+Each example builds its own User and enum classes, so the users
+are rebuilt for every example from the same preference
+combinations.
+
+	python benchmark.py [users] [channels]
+
+users defaults to 100000.  channels limits the population to users
+with exactly that many preferences, leave it off to mix them all.
+'''
+PREFERENCES = ['EMAIL', 'SMS', 'PUSH']
+
+def preference_combinations(channels:int|None)->list[tuple[str, ...]]:
+	sizes = [channels] if channels is not None else range(1, len(PREFERENCES) + 1)
+	return [combo for size in sizes for combo in itertools.combinations(PREFERENCES, size)]
+
+def build_population(module, combos:list[tuple[str, ...]])->list:
+	users = []
+	for combo in combos:
+		user = module.User()
+		user.notification_preferences = [module.NotificationPreferenceEnum[name] for name in combo]
+		user.notification_preference = user.notification_preferences[0]
+		users.append(user)
+	return users
+
+def measure(module, factory, combos:list[tuple[str, ...]], sample:int)->tuple[float, float, float]:
+	users = build_population(module, combos)
+	orders = []
+	append = orders.append
+	Order = module.Order
+
+	#timing runs without tracemalloc, tracing slows every allocation down
+	start = time.perf_counter()
+	for user in users:
+		append(Order(user, factory))
+	seconds = time.perf_counter() - start
+	orders.clear()
+
+	#then a sample of Orders is created again under tracemalloc, one at a time
+	peak_total = 0
+	kept_total = 0
+	sample_users = users[:sample]
+	tracemalloc.start()
+	for user in sample_users:
+		before = tracemalloc.get_traced_memory()[0]
+		tracemalloc.reset_peak()
+		append(Order(user, factory))
+		current, peak = tracemalloc.get_traced_memory()
+		peak_total += peak - before
+		kept_total += current - before
+	tracemalloc.stop()
+
+	return len(users) / seconds, peak_total / len(sample_users), kept_total / len(sample_users)
+
+def main():
+	size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+	channels = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+	random.seed(0)
+	combos = random.choices(preference_combinations(channels), k=size)
+
+	example6 = importlib.import_module('example6')
+	example7 = importlib.import_module('example7')
+	example8 = importlib.import_module('example8')
+	example11 = importlib.import_module('example11')
+
+	cases = [
+		('example6 NotificationFactory', example6, example6.NotificationFactory()),
+		('example6 MultiNotificationFactory', example6, example6.MultiNotificationFactory()),
+		('example7 NotificationFactory', example7, example7.NotificationFactory()),
+		('example7 MultiNotificationFactory', example7, example7.MultiNotificationFactory()),
+		('example8 MultiNotificationFactory', example8, example8.MultiNotificationFactory()),
+		('example11 lazy Order', example11, example11.MultiNotificationFactory()),
+	]
+
+	print('{} users, {} channels each'.format(size, channels if channels is not None else '1-3'))
+	print('{:<36} {:>14} {:>12} {:>12}'.format('factory', 'ops/sec', 'peak B/op', 'kept B/op'))
+	for name, module, factory in cases:
+		ops, peak, kept = measure(module, factory, combos, min(size, 2000))
+		print('{:<36} {:>14,.0f} {:>12,.0f} {:>12,.0f}'.format(name, ops, peak, kept))
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,256 @@
+from abc import ABC, abstractmethod
+from enum import Enum
+from typing import Callable, Dict, List
+import time
+
+'''
+Picture shipping day.  100,000 orders go out the door and
+every one of them calls notify_user().  That is 100,000
+separate send() calls, and every one of those is a separate
+request to the email / SMS / push provider.  Each request
+has overhead, opening the connection, authenticating,
+waiting for the reply, that has nothing to do with the
+message itself.
+
+Almost every provider has a bulk API that takes many
+messages in one request.  We just need a way to use it.
+
+First we give NotificationInterface a send_many() method.
+It is NOT abstract.  By default it just calls send() for
+each message, so every notification we already have keeps
+working without any changes.  Notifications whose provider
+has a bulk API override it to make one request instead.
+
+We also give NotificationInterface a channels() method.  A
+regular notification is its own single channel.
+MultiNotificaiton returns the channels it wraps.  This lets
+someone look inside a composite without knowing what it is.
+
+Second we add a NotificationDispatcher.  Instead of sending
+right away, Order.notify_user() hands the message to the
+dispatcher.  The dispatcher splits it into channels and puts
+it in a pending batch for each channel.  A channel's batch is
+flushed with one send_many() call when either
+
+	it has max_batch messages in it, or
+	its oldest message has been waiting max_delay seconds
+
+The size limit keeps a batch from growing bigger than the
+provider allows, and the time limit makes sure a quiet
+channel doesn't sit on a message forever.  Something needs to
+call poll() every so often to check the time limit, and
+flush() sends everything that is left.  If send_many() raises,
+the batch is kept and goes out with the next poll() or flush(),
+so one failed bulk call doesn't lose any messages.
+
+The channels in this example talk to a FakeProvider instead of
+a real one.  It just counts how many requests and messages it
+received, and estimates how long a real provider would have
+spent on those requests, so we can see the difference.
+
+We are building on the registry from example 7, so every order
+shares the same channel objects, which is what lets the
+dispatcher group their messages together.
+'''
+class User:
+	def __init__(self):
+		#other config properties...
+		self.notification_preference = NotificationPreferenceEnum.SMS
+		self.notification_preferences = [
+			NotificationPreferenceEnum.SMS,
+			NotificationPreferenceEnum.PUSH,
+			NotificationPreferenceEnum.EMAIL
+		]
+
+class NotificationPreferenceEnum(Enum):
+	EMAIL = 'EMAIL'
+	SMS = 'SMS'
+	PUSH = 'PUSH'
+
+class FakeProvider:
+	#a real provider costs about request_overhead seconds per request
+	def __init__(self, name:str, request_overhead:float=0.005):
+		self.name = name
+		self.request_overhead = request_overhead
+		self.requests = 0
+		self.messages = 0
+
+	def send(self, message:str)->None:
+		self.requests += 1
+		self.messages += 1
+
+	def send_bulk(self, messages:List[str])->None:
+		self.requests += 1
+		self.messages += len(messages)
+
+	@property
+	def seconds(self)->float:
+		return self.requests * self.request_overhead
+
+class NotificationInterface(ABC):
+	@abstractmethod
+	def send(self, message:str)->None:
+		pass
+
+	def send_many(self, messages:List[str])->None:
+		for message in messages:
+			self.send(message)
+
+	def channels(self)->List['NotificationInterface']:
+		return [self]
+
+class NotificationRegistry:
+	def __init__(self):
+		self._notifications:dict[NotificationPreferenceEnum, NotificationInterface] = {}
+
+	def register(self, preference:NotificationPreferenceEnum)->Callable[[type], type]:
+		def decorator(cls:type)->type:
+			self._notifications[preference] = cls()
+			return cls
+		return decorator
+
+	def get(self, preference:NotificationPreferenceEnum)->NotificationInterface:
+		notification = self._notifications.get(preference)
+		if notification is None:
+			raise ValueError('no notification registered for {}'.format(preference))
+		return notification
+
+registry = NotificationRegistry()
+
+@registry.register(NotificationPreferenceEnum.EMAIL)
+class EmailNotification(NotificationInterface):
+	def __init__(self, provider:FakeProvider|None=None):
+		self.provider = provider if provider is not None else FakeProvider('Email')
+
+	def send(self, message:str)->None:
+		self.provider.send('sent from Email: {}'.format(message))
+
+	def send_many(self, messages:List[str])->None:
+		self.provider.send_bulk(['sent from Email: {}'.format(message) for message in messages])
+
+@registry.register(NotificationPreferenceEnum.SMS)
+class SmsNotification(NotificationInterface):
+	def __init__(self, provider:FakeProvider|None=None):
+		self.provider = provider if provider is not None else FakeProvider('SMS')
+
+	def send(self, message:str)->None:
+		self.provider.send('sent from SMS: {}'.format(message))
+
+	def send_many(self, messages:List[str])->None:
+		self.provider.send_bulk(['sent from SMS: {}'.format(message) for message in messages])
+
+@registry.register(NotificationPreferenceEnum.PUSH)
+class PushNotification(NotificationInterface):
+	#this provider has no bulk api, so it keeps the default send_many()
+	def __init__(self, provider:FakeProvider|None=None):
+		self.provider = provider if provider is not None else FakeProvider('Push')
+
+	def send(self, message:str)->None:
+		self.provider.send('sent from Push: {}'.format(message))
+
+class MultiNotificaiton(NotificationInterface):
+	def __init__(self, notifications:List[NotificationInterface]):
+		self.notifications = notifications
+
+	def send(self, message)->None:
+		for notification in self.notifications:
+			notification.send(message)
+
+	def send_many(self, messages:List[str])->None:
+		for notification in self.notifications:
+			notification.send_many(messages)
+
+	def channels(self)->List[NotificationInterface]:
+		return [channel for notification in self.notifications for channel in notification.channels()]
+
+class NotificationFactoryInterface(ABC):
+	def create(self, type:NotificationPreferenceEnum)->NotificationInterface:
+		pass
+
+class MultiNotificationFactory(NotificationFactoryInterface):
+	def __init__(self, registry:NotificationRegistry=registry):
+		self.registry = registry
+
+	def create(self, user:User)->NotificationInterface:
+		return MultiNotificaiton([
+			self.registry.get(preference) for preference in user.notification_preferences
+		])
+
+class NotificationDispatcher:
+	def __init__(self, max_batch:int=500, max_delay:float=0.05):
+		self.max_batch = max_batch
+		self.max_delay = max_delay
+		self._pending:Dict[NotificationInterface, List[str]] = {}
+		self._oldest:Dict[NotificationInterface, float] = {}
+
+	def enqueue(self, notification:NotificationInterface, message:str)->None:
+		for channel in notification.channels():
+			batch = self._pending.get(channel)
+			if batch is None:
+				batch = self._pending[channel] = []
+				self._oldest[channel] = time.monotonic()
+			batch.append(message)
+			if len(batch) >= self.max_batch:
+				self._flush_channel(channel)
+
+	def poll(self)->None:
+		now = time.monotonic()
+		for channel, oldest in list(self._oldest.items()):
+			if now - oldest >= self.max_delay:
+				self._flush_channel(channel)
+
+	def flush(self)->None:
+		for channel in list(self._pending):
+			self._flush_channel(channel)
+
+	def _flush_channel(self, channel:NotificationInterface)->None:
+		#only forget the batch once it has gone out, if send_many() raises it stays
+		#pending and is tried again on the next poll() or flush()
+		channel.send_many(self._pending[channel])
+		del self._pending[channel]
+		del self._oldest[channel]
+
+class Order:
+	def __init__(self, user:User, notificationFactory:NotificationFactoryInterface,
+			dispatcher:NotificationDispatcher|None=None):
+		self.user = user
+		self.notification = notificationFactory.create(self.user)
+		self.dispatcher = dispatcher
+
+	def notify_user(self, message)->None:
+		if self.dispatcher is not None:
+			self.dispatcher.enqueue(self.notification, message)
+		else:
+			self.notification.send(message)
+
+def print_providers(name:str, seconds:float):
+	print('{} took {:.3f}s'.format(name, seconds))
+	for preference in NotificationPreferenceEnum:
+		provider = registry.get(preference).provider
+		print('\t{}: {} messages in {} requests, about {:.1f}s at the provider'.format(
+			provider.name, provider.messages, provider.requests, provider.seconds
+		))
+		provider.requests = provider.messages = 0
+
+def main():
+	user = User()
+	notificationFactory = MultiNotificationFactory()
+	orders = [Order(user, notificationFactory) for _ in range(100000)]
+
+	start = time.perf_counter()
+	for order in orders:
+		order.notify_user("Your order has been shipped")
+	print_providers('one at a time', time.perf_counter() - start)
+
+	dispatcher = NotificationDispatcher(max_batch=1000, max_delay=0.05)
+	orders = [Order(user, notificationFactory, dispatcher) for _ in range(100000)]
+	start = time.perf_counter()
+	for i, order in enumerate(orders):
+		order.notify_user("Your order has been shipped")
+		if i % 100 == 0:
+			dispatcher.poll()
+	dispatcher.flush()
+	print_providers('batched', time.perf_counter() - start)
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,139 @@
+from abc import ABC, abstractmethod
+from enum import Enum
+from typing import Iterable, List
+
+'''
+Look at the Order constructor from example 6 again.  The very
+first thing it does is ask the factory to create the user's
+notification.  That happens for EVERY order, the moment it is
+created.
+
+But most orders are never notified.  They get cancelled,
+merged into other orders, or are test orders that never go
+anywhere.  Every one of those paid the cost of the factory
+for nothing, and Order is created in some of the busiest parts
+of our code, like importing orders and checking out.
+
+The fix is to be lazy.  The Order now just remembers the
+factory, and does not ask it for anything until the first time
+the notification is actually needed.  After that it keeps the
+notification it got, so the factory is only ever called once
+per order.  notification is now a property, so any code that
+was reading order.notification still works.
+
+Sometimes we KNOW a big group of orders is about to be
+notified, like when a truck full of orders ships.  For that we
+add Order.prewarm().  It resolves the notifications for many
+orders up front.  Since orders for the same user will always get
+the same kind of notification, it only calls the factory once
+per user, not once per order.  (This assumes the notifications
+are safe to share between orders, which ours are since they don't
+hold any data.)
+'''
+class User:
+	def __init__(self):
+		#other config properties...
+		self.notification_preference = NotificationPreferenceEnum.SMS
+		self.notification_preferences = [
+			NotificationPreferenceEnum.SMS,
+			NotificationPreferenceEnum.PUSH,
+			NotificationPreferenceEnum.EMAIL
+		]
+
+class NotificationPreferenceEnum(Enum):
+	EMAIL = 'EMAIL'
+	SMS = 'SMS'
+	PUSH = 'PUSH'
+
+class NotificationInterface(ABC):
+	@abstractmethod
+	def send(self, message:str)->None:
+		pass
+
+class EmailNotification(NotificationInterface):
+	def send(self, message:str)->None:
+		print('sent from Email: {}'.format(message))
+
+class SmsNotification(NotificationInterface):
+	def send(self, message:str)->None:
+		print('sent from SMS: {}'.format(message))
+
+class PushNotification(NotificationInterface):
+	def send(self, message:str)->None:
+		print('sent from Push: {}'.format(message))
+
+class MultiNotificaiton(NotificationInterface):
+	def __init__(self, notifications:List[NotificationInterface]):
+		self.notifications = notifications
+
+	def send(self, message)->None:
+		for notification in self.notifications:
+			notification.send(message)
+
+class NotificationFactoryInterface(ABC):
+	def create(self, type:NotificationPreferenceEnum)->NotificationInterface:
+		pass
+
+class MultiNotificationFactory(NotificationFactoryInterface):
+	def __init__(self):
+		self.created = 0
+
+	def create(self, user:User)->NotificationInterface:
+		self.created += 1
+		notifications = []
+		for preference in user.notification_preferences:
+			if preference == NotificationPreferenceEnum.EMAIL:
+				notifications.append(EmailNotification())
+			if preference == NotificationPreferenceEnum.SMS:
+				notifications.append(SmsNotification())
+			if preference == NotificationPreferenceEnum.PUSH:
+				notifications.append(PushNotification())
+
+		return MultiNotificaiton(notifications)
+
+class Order:
+	def __init__(self, user:User, notificationFactory:NotificationFactoryInterface):
+		self.user = user
+		self._notificationFactory = notificationFactory
+		self._notification:NotificationInterface|None = None
+
+	@property
+	def notification(self)->NotificationInterface:
+		if self._notification is None:
+			self._notification = self._notificationFactory.create(self.user)
+		return self._notification
+
+	def notify_user(self, message)->None:
+		self.notification.send(message)
+
+	@staticmethod
+	def prewarm(orders:Iterable['Order'])->None:
+		#one factory call per (factory, user) instead of one per order
+		resolved:dict[tuple[int, int], NotificationInterface] = {}
+		for order in orders:
+			if order._notification is not None:
+				continue
+			key = (id(order._notificationFactory), id(order.user))
+			notification = resolved.get(key)
+			if notification is None:
+				notification = resolved[key] = order._notificationFactory.create(order.user)
+			order._notification = notification
+
+def main():
+	user = User()
+	notificationFactory = MultiNotificationFactory()
+
+	#lots of orders, but only one of them ever gets notified
+	orders = [Order(user, notificationFactory) for _ in range(10000)]
+	print('created {} orders, factory called {} times'.format(len(orders), notificationFactory.created))
+	orders[0].notify_user("Your order has been shipped")
+	orders[0].notify_user("Your order has been delivered")
+	print('factory called {} times'.format(notificationFactory.created))
+
+	#a whole truck is about to ship, so resolve them all up front
+	truck = [Order(User(), notificationFactory) for _ in range(5)] + orders[1:1000]
+	Order.prewarm(truck)
+	print('prewarmed {} orders, factory called {} times'.format(len(truck), notificationFactory.created))
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,242 @@
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import Dict, List
+import threading
+import time
+
+'''
+During a flash sale hundreds of orders come in at the same
+moment, and every one of them sends an SMS and a push
+notification right away.  Our SMS and push providers only
+allow so many messages per second.  Go over that and they
+start rejecting messages, we retry, the retries get rejected
+too, and everything ends up slower than if we had just
+waited our turn.
+
+So we are going to wait our turn on purpose, using a token
+bucket.  Picture a bucket that holds up to capacity tokens.
+Tokens drip into it at rate tokens per second.  Sending a
+message costs one token.  If the bucket is empty, you wait
+for the next drip.  The capacity lets a small burst go out
+immediately, and after that messages go out at a smooth,
+steady rate that never goes over the limit.
+
+RateLimitedNotification uses the decorator pattern from the
+decorator-pattern examples.  It implements NotificationInterface
+and wraps any other NotificationInterface, so nothing else has
+to know it is there.  Each channel gets its own wrapper with
+its own bucket, since each provider has its own limit.
+
+send() does not make the caller wait.  It puts the message in
+a queue and returns right away.  A background thread drains
+the queue, taking a token from the bucket before each send.
+
+The wrapper also keeps RateLimitMetrics so we can see how
+it is doing:
+
+	depth / max_depth - how many messages are waiting now,
+		and the most that were ever waiting at once
+	average_wait / max_wait - how long messages sat in the
+		queue before they were sent
+	failed - how many sends the provider rejected.  A failed send
+		is logged and counted, and the queue keeps draining.
+
+join() waits until the queue is empty, and close() joins and
+stops the background thread.  After close(), send() raises
+RuntimeError instead of queueing a message nobody will send.
+'''
+class User:
+	def __init__(self):
+		#other config properties...
+		self.notification_preference = NotificationPreferenceEnum.SMS
+		self.notification_preferences = [
+			NotificationPreferenceEnum.SMS,
+			NotificationPreferenceEnum.PUSH,
+			NotificationPreferenceEnum.EMAIL
+		]
+
+class NotificationPreferenceEnum(Enum):
+	EMAIL = 'EMAIL'
+	SMS = 'SMS'
+	PUSH = 'PUSH'
+
+class NotificationInterface(ABC):
+	@abstractmethod
+	def send(self, message:str)->None:
+		pass
+
+class EmailNotification(NotificationInterface):
+	def send(self, message:str)->None:
+		print('sent from Email: {}'.format(message))
+
+class SmsNotification(NotificationInterface):
+	def send(self, message:str)->None:
+		print('sent from SMS: {}'.format(message))
+
+class PushNotification(NotificationInterface):
+	def send(self, message:str)->None:
+		print('sent from Push: {}'.format(message))
+
+class MultiNotificaiton(NotificationInterface):
+	def __init__(self, notifications:List[NotificationInterface]):
+		self.notifications = notifications
+
+	def send(self, message)->None:
+		for notification in self.notifications:
+			notification.send(message)
+
+class TokenBucket:
+	def __init__(self, rate:float, capacity:int):
+		self.rate = rate
+		self.capacity = capacity
+		self._tokens = float(capacity)
+		self._updated = time.monotonic()
+
+	def take(self)->None:
+		#blocks until a token is available, then spends it
+		while True:
+			now = time.monotonic()
+			self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+			self._updated = now
+			if self._tokens >= 1:
+				self._tokens -= 1
+				return
+			time.sleep((1 - self._tokens) / self.rate)
+
+@dataclass
+class RateLimitMetrics:
+	depth:int = 0
+	max_depth:int = 0
+	sent:int = 0
+	failed:int = 0
+	total_wait:float = 0.0
+	max_wait:float = 0.0
+
+	@property
+	def average_wait(self)->float:
+		handled = self.sent + self.failed
+		return self.total_wait / handled if handled else 0.0
+
+class RateLimitedNotification(NotificationInterface):
+	def __init__(self, notification:NotificationInterface, rate:float, capacity:int=1):
+		self.notification = notification
+		self.bucket = TokenBucket(rate, capacity)
+		self.metrics = RateLimitMetrics()
+		self._queue:deque[tuple[float, str]] = deque()
+		self._condition = threading.Condition()
+		self._closed = False
+		self._sending = False
+		self._worker = threading.Thread(target=self._drain, daemon=True)
+		self._worker.start()
+
+	def send(self, message:str)->None:
+		with self._condition:
+			if self._closed:
+				#the worker has stopped, nothing would ever send this
+				raise RuntimeError('rate limited notification is closed')
+			self._queue.append((time.monotonic(), message))
+			self.metrics.depth = len(self._queue)
+			self.metrics.max_depth = max(self.metrics.max_depth, self.metrics.depth)
+			self._condition.notify_all()
+
+	def join(self)->None:
+		with self._condition:
+			self._condition.wait_for(lambda: not self._queue and not self._sending)
+
+	def close(self)->None:
+		self.join()
+		with self._condition:
+			self._closed = True
+			self._condition.notify_all()
+		self._worker.join()
+
+	def _drain(self)->None:
+		while True:
+			with self._condition:
+				self._condition.wait_for(lambda: self._queue or self._closed)
+				if not self._queue:
+					return
+				self._sending = True
+
+			self.bucket.take()
+			with self._condition:
+				queued, message = self._queue.popleft()
+				self.metrics.depth = len(self._queue)
+
+			wait = time.monotonic() - queued
+			failed = False
+			try:
+				self.notification.send(message)
+			except Exception as e:
+				#one rejected message must not stop the rest of the queue
+				print('rate limited send failed: {!r}'.format(e))
+				failed = True
+			finally:
+				with self._condition:
+					if failed:
+						self.metrics.failed += 1
+					else:
+						self.metrics.sent += 1
+					self.metrics.total_wait += wait
+					self.metrics.max_wait = max(self.metrics.max_wait, wait)
+					self._sending = False
+					self._condition.notify_all()
+
+class NotificationFactoryInterface(ABC):
+	def create(self, type:NotificationPreferenceEnum)->NotificationInterface:
+		pass
+
+class RateLimitedNotificationFactory(NotificationFactoryInterface):
+	def __init__(self, limits:Dict[NotificationPreferenceEnum, tuple[float, int]]):
+		#every order shares the same limited channels, that is the whole point
+		self.channels:Dict[NotificationPreferenceEnum, NotificationInterface] = {
+			NotificationPreferenceEnum.EMAIL: EmailNotification(),
+			NotificationPreferenceEnum.SMS: SmsNotification(),
+			NotificationPreferenceEnum.PUSH: PushNotification()
+		}
+		for preference, (rate, capacity) in limits.items():
+			self.channels[preference] = RateLimitedNotification(self.channels[preference], rate, capacity)
+
+	def create(self, user:User)->NotificationInterface:
+		return MultiNotificaiton([self.channels[preference] for preference in user.notification_preferences])
+
+	def close(self)->None:
+		for channel in self.channels.values():
+			if isinstance(channel, RateLimitedNotification):
+				channel.close()
+
+class Order:
+	def __init__(self, user:User, notificationFactory:NotificationFactoryInterface):
+		self.user = user
+		self.notification = notificationFactory.create(self.user)
+
+	def notify_user(self, message)->None:
+		self.notification.send(message)
+
+def main():
+	user = User()
+	notificationFactory = RateLimitedNotificationFactory({
+		#SMS allows 10 per second with bursts of 5, push 20 per second with bursts of 5
+		NotificationPreferenceEnum.SMS: (10, 5),
+		NotificationPreferenceEnum.PUSH: (20, 5),
+	})
+
+	#flash sale! 20 orders all at once
+	start = time.perf_counter()
+	for i in range(20):
+		Order(user, notificationFactory).notify_user('Order {} confirmed'.format(i))
+	print('all orders placed after {:.3f}s'.format(time.perf_counter() - start))
+
+	notificationFactory.close()
+	print('all notifications sent after {:.3f}s'.format(time.perf_counter() - start))
+	for preference, channel in notificationFactory.channels.items():
+		if isinstance(channel, RateLimitedNotification):
+			metrics = channel.metrics
+			print('{}: sent {}, failed {}, max queue depth {}, average wait {:.3f}s, max wait {:.3f}s'.format(
+				preference.value, metrics.sent, metrics.failed, metrics.max_depth, metrics.average_wait, metrics.max_wait
+			))
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,250 @@
+from abc import ABC, abstractmethod
+from enum import Enum
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+'''
+Back to the simple NotificationFactory from example 5.
+Order.notify_user() calls send() right there and then, so
+checkout has to wait for the provider to answer before it can
+move on.  And if the process dies right after the order is
+saved but before send() finishes, the message is just gone.
+Nobody knows it was never sent.
+
+The fix is an outbox.  Instead of sending, notify_user() writes
+the message into a small SQLite database (the outbox) and
+returns right away.  Writing one row to a local file is much
+faster than talking to a provider, and once the row is saved,
+the message survives a crash.
+
+A background worker reads rows out of the outbox, gets the right
+notification from the NotificationFactory, and sends them.
+Only AFTER a message is sent is its row deleted.  If the process
+dies in between, the row is still there the next time the
+outbox starts, and it gets sent again.  That means a message
+might very rarely be sent twice, but it will never be lost.
+This is called at-least-once delivery.
+
+The worker reads rows in batches, sends the whole batch, and
+then deletes all of the sent rows in one transaction.
+Committing to SQLite means waiting on the disk, so doing it
+once per batch instead of once per message saves a lot of time.
+If a send fails, its attempts count goes up and the row gets
+retried on the next pass.  A message that fails max_attempts
+times is probably never going to work (a bad phone number, say),
+and retrying it forever just wastes every pass on it.  So it is
+moved to a dead_letter table, in the same transaction as the
+rest of the batch, where someone can look at it later.
+
+SQLite connections can't be shared between threads, so the
+worker opens its own, and so does every checkout thread that
+calls notify_user().  WAL mode lets the worker read while
+orders are still being written.
+
+The factory gets a small create_for() method, so the worker can
+ask for a notification by preference without needing the whole
+User.
+'''
+class User:
+	def __init__(self):
+		#other config properties...
+		self.notification_preference = NotificationPreferenceEnum.SMS
+
+class NotificationPreferenceEnum(Enum):
+	EMAIL = 'EMAIL'
+	SMS = 'SMS'
+	PUSH = 'PUSH'
+
+class NotificationInterface(ABC):
+	@abstractmethod
+	def send(self, message:str)->None:
+		pass
+
+class EmailNotification(NotificationInterface):
+	def send(self, message:str)->None:
+		print('sent from Email: {}'.format(message))
+
+class SmsNotification(NotificationInterface):
+	def send(self, message:str)->None:
+		print('sent from SMS: {}'.format(message))
+
+class PushNotification(NotificationInterface):
+	def send(self, message:str)->None:
+		print('sent from Push: {}'.format(message))
+
+class NotificationFactoryInterface(ABC):
+	def create(self, type:NotificationPreferenceEnum)->NotificationInterface:
+		pass
+
+class NotificationFactory(NotificationFactoryInterface):
+	def create(self, user:User)->NotificationInterface:
+		return self.create_for(user.notification_preference)
+
+	def create_for(self, type:NotificationPreferenceEnum)->NotificationInterface:
+		if type == NotificationPreferenceEnum.EMAIL:
+			return EmailNotification()
+		elif type == NotificationPreferenceEnum.SMS:
+			return SmsNotification()
+		elif type == NotificationPreferenceEnum.PUSH:
+			return PushNotification()
+
+class Outbox:
+	def __init__(self, path:str, notificationFactory:NotificationFactory, batch_size:int=100,
+			poll_interval:float=0.5, max_attempts:int=5):
+		self.path = path
+		self.notificationFactory = notificationFactory
+		self.batch_size = batch_size
+		self.poll_interval = poll_interval
+		self.max_attempts = max_attempts
+		#every thread that appends gets its own connection, see _writer()
+		self._local = threading.local()
+		self._connections:list[sqlite3.Connection] = []
+		self._connections_lock = threading.Lock()
+		db = self._writer()
+		db.execute('''
+			CREATE TABLE IF NOT EXISTS outbox (
+				id INTEGER PRIMARY KEY AUTOINCREMENT,
+				preference TEXT NOT NULL,
+				message TEXT NOT NULL,
+				attempts INTEGER NOT NULL DEFAULT 0
+			)
+		''')
+		db.execute('''
+			CREATE TABLE IF NOT EXISTS dead_letter (
+				id INTEGER PRIMARY KEY,
+				preference TEXT NOT NULL,
+				message TEXT NOT NULL,
+				attempts INTEGER NOT NULL,
+				error TEXT NOT NULL
+			)
+		''')
+		db.commit()
+		self._wake = threading.Event()
+		self._closed = threading.Event()
+		self._worker:threading.Thread|None = None
+
+	def append(self, preference:NotificationPreferenceEnum, message:str)->None:
+		db = self._writer()
+		with db:
+			db.execute(
+				'INSERT INTO outbox (preference, message) VALUES (?, ?)',
+				(preference.value, message)
+			)
+		self._wake.set()
+
+	def start(self)->None:
+		self._worker = threading.Thread(target=self._drain, daemon=True)
+		self._worker.start()
+
+	def close(self)->None:
+		self._closed.set()
+		self._wake.set()
+		if self._worker is not None:
+			self._worker.join()
+		with self._connections_lock:
+			connections, self._connections = self._connections, []
+		for db in connections:
+			db.close()
+
+	def pending(self)->int:
+		return self._writer().execute('SELECT COUNT(*) FROM outbox').fetchone()[0]
+
+	def dead_letters(self)->int:
+		return self._writer().execute('SELECT COUNT(*) FROM dead_letter').fetchone()[0]
+
+	def _writer(self)->sqlite3.Connection:
+		db = getattr(self._local, 'db', None)
+		if db is None:
+			#only this thread uses it, but close() closes it from another thread
+			db = self._local.db = self._connect(check_same_thread=False)
+			with self._connections_lock:
+				self._connections.append(db)
+		return db
+
+	def _connect(self, check_same_thread:bool=True)->sqlite3.Connection:
+		db = sqlite3.connect(self.path, check_same_thread=check_same_thread)
+		db.execute('PRAGMA journal_mode=WAL')
+		#with WAL, NORMAL still survives a process crash, only a power cut can lose the last commit
+		db.execute('PRAGMA synchronous=NORMAL')
+		return db
+
+	def _drain(self)->None:
+		db = self._connect()
+		notifications:dict[NotificationPreferenceEnum, NotificationInterface] = {}
+		last_id = 0
+		while True:
+			rows = db.execute(
+				'SELECT id, preference, message, attempts FROM outbox WHERE id > ? ORDER BY id LIMIT ?',
+				(last_id, self.batch_size)
+			).fetchall()
+
+			if not rows:
+				if self._closed.is_set():
+					break
+				#start over from the top so failed rows get retried
+				last_id = 0
+				self._wake.wait(self.poll_interval)
+				self._wake.clear()
+				continue
+
+			sent, failed, dead = [], [], []
+			for row_id, preference, message, attempts in rows:
+				preference = NotificationPreferenceEnum(preference)
+				notification = notifications.get(preference)
+				if notification is None:
+					notification = notifications[preference] = self.notificationFactory.create_for(preference)
+				try:
+					notification.send(message)
+					sent.append((row_id,))
+				except Exception as e:
+					attempts += 1
+					if attempts >= self.max_attempts:
+						print('outbox send failed {} times, moving it to dead_letter: {!r}'.format(attempts, e))
+						dead.append((row_id, preference.value, message, attempts, repr(e)))
+					else:
+						print('outbox send failed, will retry: {!r}'.format(e))
+						failed.append((row_id,))
+			last_id = rows[-1][0]
+
+			with db:
+				db.executemany('DELETE FROM outbox WHERE id = ?', sent)
+				db.executemany(
+					'INSERT INTO dead_letter (id, preference, message, attempts, error) VALUES (?, ?, ?, ?, ?)',
+					dead
+				)
+				db.executemany('DELETE FROM outbox WHERE id = ?', [(row[0],) for row in dead])
+				db.executemany('UPDATE outbox SET attempts = attempts + 1 WHERE id = ?', failed)
+		db.close()
+
+class Order:
+	def __init__(self, user:User, outbox:Outbox):
+		self.user = user
+		self.outbox = outbox
+
+	def notify_user(self, message)->None:
+		self.outbox.append(self.user.notification_preference, message)
+
+def main():
+	path = os.path.join(tempfile.mkdtemp(), 'outbox.db')
+	user = User()
+	notificationFactory = NotificationFactory()
+
+	outbox = Outbox(path, notificationFactory)
+	start = time.perf_counter()
+	for i in range(3):
+		Order(user, outbox).notify_user('Order {} has been shipped'.format(i))
+	print('checkout finished in {:.4f}s, {} waiting in the outbox'.format(time.perf_counter() - start, outbox.pending()))
+	print('crash! nothing was sent')
+	#the process dies here, the worker was never started
+
+	outbox = Outbox(path, notificationFactory)
+	outbox.start()
+	Order(user, outbox).notify_user('Order 3 has been shipped')
+	#close() lets the worker finish everything in the outbox first
+	outbox.close()
+
+if __name__ == "__main__":
+	main()
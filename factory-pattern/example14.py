@@ -0,0 +1,258 @@
+from abc import ABC, abstractmethod
+from enum import Enum
+from functools import lru_cache
+from itertools import repeat
+from operator import itemgetter
+from string import Formatter
+from typing import Dict, Iterable, List, Tuple
+import time
+
+'''
+Up until now our messages have been simple strings like
+"Your order has been shipped".  Real messages are templates
+that get filled in for each order, in each user's language:
+
+	"Hi {name}, order {order_id} has shipped!"
+
+On top of that, every notification wraps the message in its
+own text with '...{}'.format(message).  When a big wave of
+orders ships, all of that formatting starts to add up.  Every
+single call to format() reads through the whole template again
+looking for the {} parts, even though the template never changes.
+
+So we are going to add a small template engine in front of the
+notifications.
+
+Compiling.  CompiledTemplate reads through the template ONCE and
+splits it into the plain text and the names of the fields that
+go between them.  It then turns "Hi {name}" into "Hi %s" and
+remembers that the first %s is name.  Filling in a %s string
+with a tuple of values is one of the fastest ways python has to
+build a string, and it doesn't have to look up field names.
+Templates with fancy fields like {total:.2f} or {user.name} just
+fall back to format_map().
+
+Caching.  The text that actually gets sent depends on three
+things: which template, which language (locale), and which
+channel, since each channel adds its own wrapper text.  The
+TemplateEngine folds the channel's wrapper and the localized
+template into one string and compiles that.  compile() is
+cached by (template, locale, channel), so each combination is
+compiled exactly once, no matter how many orders use it.
+
+Batches.  render_orders() takes a whole wave of orders, groups
+them by (locale, channel), and renders each group with a single
+compiled template, so there is no lookup per order at all.
+
+To make this work each notification now exposes its wrapper text
+and a deliver() method that sends text that has already been
+formatted.  send() still works exactly like before.
+NotificationInterface also gets send_template(), which renders a
+template with the channel's own compiled version and delivers
+it, and channels(), which lists the single channels behind a
+notification so render_orders() can group by them.  The factory
+still hands back one NotificationInterface, a MultiNotificaiton
+like example 6, which passes both of these on to its channels,
+so Order never needs to know which channels it has.
+'''
+class LocaleEnum(Enum):
+	EN = 'en'
+	ES = 'es'
+
+class User:
+	def __init__(self, name:str, locale:LocaleEnum=LocaleEnum.EN):
+		#other config properties...
+		self.name = name
+		self.locale = locale
+		self.notification_preferences = [
+			NotificationPreferenceEnum.SMS,
+			NotificationPreferenceEnum.EMAIL
+		]
+
+class NotificationPreferenceEnum(Enum):
+	EMAIL = 'EMAIL'
+	SMS = 'SMS'
+	PUSH = 'PUSH'
+
+class NotificationInterface(ABC):
+	wrapper:str = '{}'
+
+	@abstractmethod
+	def deliver(self, text:str)->None:
+		pass
+
+	def send(self, message:str)->None:
+		self.deliver(self.wrapper.format(message))
+
+	def send_template(self, engine:'TemplateEngine', template:str, locale:LocaleEnum, values:Dict[str, object])->None:
+		self.deliver(engine.compile(template, locale, type(self)).render(values))
+
+	def channels(self)->List['NotificationInterface']:
+		return [self]
+
+class EmailNotification(NotificationInterface):
+	wrapper = 'sent from Email: {}'
+
+	def deliver(self, text:str)->None:
+		print(text)
+
+class SmsNotification(NotificationInterface):
+	wrapper = 'sent from SMS: {}'
+
+	def deliver(self, text:str)->None:
+		print(text)
+
+class PushNotification(NotificationInterface):
+	wrapper = 'sent from Push: {}'
+
+	def deliver(self, text:str)->None:
+		print(text)
+
+class MultiNotificaiton(NotificationInterface):
+	def __init__(self, notifications:List[NotificationInterface]):
+		self.notifications = notifications
+
+	def deliver(self, text:str)->None:
+		for notification in self.notifications:
+			notification.deliver(text)
+
+	def send(self, message:str)->None:
+		for notification in self.notifications:
+			notification.send(message)
+
+	def send_template(self, engine:'TemplateEngine', template:str, locale:LocaleEnum, values:Dict[str, object])->None:
+		#every channel renders with its own compiled template, since each has its own wrapper
+		for notification in self.notifications:
+			notification.send_template(engine, template, locale, values)
+
+	def channels(self)->List[NotificationInterface]:
+		return [channel for notification in self.notifications for channel in notification.channels()]
+
+class CompiledTemplate:
+	def __init__(self, source:str):
+		self.source = source
+		pieces = list(Formatter().parse(source))
+		fields = [field for _, field, _, _ in pieces if field is not None]
+		#{user.name} or {items[0]} need format_map to look inside the value, itemgetter can't
+		simple = all(
+			(field is None or field.isidentifier()) and not spec and conversion is None
+			for _, field, spec, conversion in pieces
+		)
+
+		if simple and fields:
+			#turn "Hi {name}" into "Hi %s" plus a getter that pulls the values out in order
+			self._format = ''.join(
+				literal.replace('%', '%%') + ('%s' if field is not None else '')
+				for literal, field, _, _ in pieces
+			)
+			getter = itemgetter(*fields)
+			self._values = getter if len(fields) > 1 else lambda values: (getter(values),)
+		else:
+			#no fields, or fancy fields like {total:.2f}, let format_map handle those
+			self._format = None
+
+	def render(self, values:Dict[str, object])->str:
+		if self._format is None:
+			return self.source.format_map(values)
+		return self._format % self._values(values)
+
+	def render_many(self, values:Iterable[Dict[str, object]])->List[str]:
+		if self._format is None:
+			return [self.source.format_map(value) for value in values]
+		format, get = self._format, self._values
+		return [format % get(value) for value in values]
+
+class TemplateEngine:
+	def __init__(self, cache_size:int=1024):
+		self._templates:Dict[Tuple[str, LocaleEnum], str] = {}
+		self.compile = lru_cache(maxsize=cache_size)(self._compile)
+
+	def register(self, name:str, locale:LocaleEnum, text:str)->None:
+		self._templates[(name, locale)] = text
+		#anything compiled from the old text is now stale
+		self.compile.cache_clear()
+
+	def _compile(self, name:str, locale:LocaleEnum, channel:type)->CompiledTemplate:
+		text = self._templates.get((name, locale))
+		if text is None:
+			raise ValueError('no template {} for {}'.format(name, locale))
+		#format() does not look inside the values it inserts, so the {name} fields survive
+		return CompiledTemplate(channel.wrapper.format(text))
+
+class NotificationFactoryInterface(ABC):
+	def create(self, type:NotificationPreferenceEnum)->NotificationInterface:
+		pass
+
+class MultiNotificationFactory(NotificationFactoryInterface):
+	def __init__(self):
+		self._channels:Dict[NotificationPreferenceEnum, NotificationInterface] = {
+			NotificationPreferenceEnum.EMAIL: EmailNotification(),
+			NotificationPreferenceEnum.SMS: SmsNotification(),
+			NotificationPreferenceEnum.PUSH: PushNotification()
+		}
+
+	def create(self, user:User)->NotificationInterface:
+		return MultiNotificaiton([self._channels[preference] for preference in user.notification_preferences])
+
+class Order:
+	def __init__(self, order_id:int, user:User, notificationFactory:NotificationFactoryInterface, engine:TemplateEngine):
+		self.order_id = order_id
+		self.user = user
+		self.notification = notificationFactory.create(self.user)
+		self.engine = engine
+
+	def values(self)->Dict[str, object]:
+		return {'name': self.user.name, 'order_id': self.order_id}
+
+	def notify_user(self, template:str)->None:
+		self.notification.send_template(self.engine, template, self.user.locale, self.values())
+
+def render_orders(engine:TemplateEngine, template:str, orders:List[Order])->List[Tuple[NotificationInterface, str]]:
+	groups:Dict[Tuple[LocaleEnum, NotificationInterface], List[Dict[str, object]]] = {}
+	for order in orders:
+		values = order.values()
+		for notification in order.notification.channels():
+			groups.setdefault((order.user.locale, notification), []).append(values)
+
+	rendered = []
+	for (locale, notification), group in groups.items():
+		compiled = engine.compile(template, locale, type(notification))
+		rendered.extend(zip(repeat(notification), compiled.render_many(group)))
+	return rendered
+
+def main():
+	engine = TemplateEngine()
+	engine.register('shipped', LocaleEnum.EN, 'Hi {name}, order {order_id} has shipped!')
+	engine.register('shipped', LocaleEnum.ES, 'Hola {name}, el pedido {order_id} ha sido enviado!')
+	notificationFactory = MultiNotificationFactory()
+
+	jake = Order(1, User('Jake'), notificationFactory, engine)
+	ana = Order(2, User('Ana', LocaleEnum.ES), notificationFactory, engine)
+	jake.notify_user('shipped')
+	ana.notify_user('shipped')
+
+	#a big wave of orders, rendered in one go
+	users = [User('Customer {}'.format(i), LocaleEnum.EN if i % 2 else LocaleEnum.ES) for i in range(1000)]
+	orders = [Order(i, users[i % 1000], notificationFactory, engine) for i in range(100000)]
+
+	#the old way, formatting the template and then the wrapper for every message
+	texts = {
+		LocaleEnum.EN: 'Hi {name}, order {order_id} has shipped!',
+		LocaleEnum.ES: 'Hola {name}, el pedido {order_id} ha sido enviado!'
+	}
+	start = time.perf_counter()
+	naive = []
+	for order in orders:
+		values = order.values()
+		text = texts[order.user.locale]
+		for notification in order.notification.channels():
+			naive.append((notification, notification.wrapper.format(text.format(**values))))
+	print('format() every time: {} messages in {:.3f}s'.format(len(naive), time.perf_counter() - start))
+
+	start = time.perf_counter()
+	rendered = render_orders(engine, 'shipped', orders)
+	print('compiled and batched: {} messages in {:.3f}s'.format(len(rendered), time.perf_counter() - start))
+	print(engine.compile.cache_info())
+
+if __name__ == "__main__":
+	main()
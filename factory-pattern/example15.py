@@ -0,0 +1,183 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from enum import Enum
+from typing import Hashable, List
+import hashlib
+import time
+
+'''
+When something upstream of the Order times out, it usually
+tries again.  The retry has no idea whether the first attempt
+actually got as far as notify_user(), so the user can easily
+get "Your order has been shipped" two or three times on every
+channel.  That annoys the user, and every duplicate is a
+provider call (and money) we didn't need to spend.
+
+So we are going to put a deduplication step in front of the
+MultiNotificaiton from example 6.
+
+Every message is given an idempotency key: who it is for, which
+channel it is going out on, and a hash of the message text.
+The same message to the same user on the same channel always
+gets the same key.  Before sending, we check if we have seen
+that key recently.  If we have, it is a duplicate and we drop it
+before it ever reaches the channel.  Several copies of the same
+message arriving close together get coalesced into one.
+
+We hash the message instead of storing the text itself so every
+key is small, no matter how long the message is.
+
+The IdempotencyCache that remembers the keys has two limits, so
+it can't grow forever:
+
+	window - a key is only remembered for this many seconds.
+		After that the same message is allowed through again,
+		since sending it again a day later is probably on purpose.
+	max_size - the most keys it will hold.  If it is full, the
+		oldest key is forgotten.
+
+Keys are stored in an OrderedDict in the order they were first
+seen.  Since every key lives for the same amount of time, the
+oldest keys are always at the front, so cleaning up expired keys
+just means popping from the front until we reach one that has
+not expired.  We never have to search the whole cache.
+
+If a send fails, its key is forgotten again.  The message never
+went out, so the retry that follows is not a duplicate and has
+to be let through.
+'''
+class User:
+	def __init__(self, user_id:int):
+		#other config properties...
+		self.user_id = user_id
+		self.notification_preference = NotificationPreferenceEnum.SMS
+		self.notification_preferences = [
+			NotificationPreferenceEnum.SMS,
+			NotificationPreferenceEnum.PUSH,
+			NotificationPreferenceEnum.EMAIL
+		]
+
+class NotificationPreferenceEnum(Enum):
+	EMAIL = 'EMAIL'
+	SMS = 'SMS'
+	PUSH = 'PUSH'
+
+class NotificationInterface(ABC):
+	@abstractmethod
+	def send(self, message:str)->None:
+		pass
+
+class EmailNotification(NotificationInterface):
+	def send(self, message:str)->None:
+		print('sent from Email: {}'.format(message))
+
+class SmsNotification(NotificationInterface):
+	def send(self, message:str)->None:
+		print('sent from SMS: {}'.format(message))
+
+class PushNotification(NotificationInterface):
+	def send(self, message:str)->None:
+		print('sent from Push: {}'.format(message))
+
+class MultiNotificaiton(NotificationInterface):
+	def __init__(self, notifications:List[NotificationInterface]):
+		self.notifications = notifications
+
+	def send(self, message)->None:
+		for notification in self.notifications:
+			notification.send(message)
+
+class IdempotencyCache:
+	def __init__(self, window:float=300, max_size:int=100000):
+		self.window = window
+		self.max_size = max_size
+		self.dropped = 0
+		self._seen:OrderedDict[Hashable, float] = OrderedDict()
+
+	def first_time(self, key:Hashable)->bool:
+		now = time.monotonic()
+		#oldest keys are at the front, stop at the first one still in the window
+		while self._seen:
+			oldest_key, seen_at = next(iter(self._seen.items()))
+			if now - seen_at < self.window:
+				break
+			del self._seen[oldest_key]
+
+		if key in self._seen:
+			self.dropped += 1
+			return False
+
+		self._seen[key] = now
+		if len(self._seen) > self.max_size:
+			self._seen.popitem(last=False)
+		return True
+
+	def forget(self, key:Hashable)->None:
+		self._seen.pop(key, None)
+
+class DeduplicatedMultiNotification(NotificationInterface):
+	def __init__(self, user:User, notifications:List[NotificationInterface], cache:IdempotencyCache):
+		self.user = user
+		self.notifications = notifications
+		self.cache = cache
+
+	def send(self, message)->None:
+		digest = hashlib.blake2b(message.encode(), digest_size=16).digest()
+		for notification in self.notifications:
+			key = (self.user.user_id, type(notification), digest)
+			if self.cache.first_time(key):
+				try:
+					notification.send(message)
+				except Exception:
+					#it never went out, so the upstream retry has to be let through
+					self.cache.forget(key)
+					raise
+
+class NotificationFactoryInterface(ABC):
+	def create(self, type:NotificationPreferenceEnum)->NotificationInterface:
+		pass
+
+class DeduplicatedNotificationFactory(NotificationFactoryInterface):
+	def __init__(self, cache:IdempotencyCache):
+		self.cache = cache
+
+	def create(self, user:User)->NotificationInterface:
+		notifications = []
+		for preference in user.notification_preferences:
+			if preference == NotificationPreferenceEnum.EMAIL:
+				notifications.append(EmailNotification())
+			if preference == NotificationPreferenceEnum.SMS:
+				notifications.append(SmsNotification())
+			if preference == NotificationPreferenceEnum.PUSH:
+				notifications.append(PushNotification())
+
+		return DeduplicatedMultiNotification(user, notifications, self.cache)
+
+class Order:
+	def __init__(self, user:User, notificationFactory:NotificationFactoryInterface):
+		self.user = user
+		self.notification = notificationFactory.create(self.user)
+
+	def notify_user(self, message)->None:
+		self.notification.send(message)
+
+def main():
+	cache = IdempotencyCache(window=0.5)
+	notificationFactory = DeduplicatedNotificationFactory(cache)
+	user = User(42)
+	order = Order(user, notificationFactory)
+
+	#upstream retried three times
+	order.notify_user("Your order has been shipped")
+	order.notify_user("Your order has been shipped")
+	Order(user, notificationFactory).notify_user("Your order has been shipped")
+	#a different message still goes through
+	order.notify_user("Your order has been delivered")
+	print('dropped {} duplicate sends'.format(cache.dropped))
+
+	#once the window is over, the same message is allowed again
+	time.sleep(0.6)
+	order.notify_user("Your order has been shipped")
+
+if __name__ == "__main__":
+	main()
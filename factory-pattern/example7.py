@@ -0,0 +1,144 @@
+from abc import ABC, abstractmethod
+from enum import Enum
+from typing import Callable, List
+
+'''
+Our factories from example 6 work, but they have two problems
+that start to hurt once we have a lot of orders.
+
+First, every time we add a new notification we still have to
+go and add another elif to every factory.  The factories have
+to know about every notification that exists.
+
+Second, every single Order gets brand new notification objects.
+But look at EmailNotification, SmsNotification and
+PushNotification.  They don't hold any data at all.  One
+EmailNotification is exactly the same as any other one.  At
+millions of orders an hour, that is millions of objects that
+get created, used once, and thrown away.
+
+To fix this we are going to use a registry.  A registry is
+just a dictionary that maps each NotificationPreferenceEnum to
+the notification that handles it.
+
+Instead of the factory knowing about the notifications, the
+notifications register themselves.  NotificationRegistry has a
+register() method that we use as a class decorator.  When
+python reads the class, the decorator creates ONE instance of
+it and files it under its preference.  Adding a new
+notification is now just writing the class and putting the
+decorator on it.  The factories never change.
+
+The factories look up the preference in the registry.  That is
+a single dictionary lookup no matter how many notifications we
+have, and they hand back the shared instance instead of
+creating a new one.  Creating an Order no longer creates any
+notification objects.
+
+This only works because the notifications are stateless.  If a
+notification ever needs to hold data for a specific order, it
+can't be shared like this.
+'''
+class User:
+	def __init__(self):
+		#other config properties...
+		self.notification_preference = NotificationPreferenceEnum.SMS
+		self.notification_preferences = [
+			NotificationPreferenceEnum.SMS,
+			NotificationPreferenceEnum.PUSH,
+			NotificationPreferenceEnum.EMAIL
+		]
+
+class NotificationPreferenceEnum(Enum):
+	EMAIL = 'EMAIL'
+	SMS = 'SMS'
+	PUSH = 'PUSH'
+
+class NotificationInterface(ABC):
+	@abstractmethod
+	def send(self, message:str)->None:
+		pass
+
+class NotificationRegistry:
+	def __init__(self):
+		self._notifications:dict[NotificationPreferenceEnum, NotificationInterface] = {}
+
+	def register(self, preference:NotificationPreferenceEnum)->Callable[[type], type]:
+		def decorator(cls:type)->type:
+			self._notifications[preference] = cls()
+			return cls
+		return decorator
+
+	def get(self, preference:NotificationPreferenceEnum)->NotificationInterface:
+		notification = self._notifications.get(preference)
+		if notification is None:
+			raise ValueError('no notification registered for {}'.format(preference))
+		return notification
+
+registry = NotificationRegistry()
+
+@registry.register(NotificationPreferenceEnum.EMAIL)
+class EmailNotification(NotificationInterface):
+	def send(self, message:str)->None:
+		print('sent from Email: {}'.format(message))
+
+@registry.register(NotificationPreferenceEnum.SMS)
+class SmsNotification(NotificationInterface):
+	def send(self, message:str)->None:
+		print('sent from SMS: {}'.format(message))
+
+@registry.register(NotificationPreferenceEnum.PUSH)
+class PushNotification(NotificationInterface):
+	def send(self, message:str)->None:
+		print('sent from Push: {}'.format(message))
+
+class MultiNotificaiton(NotificationInterface):
+	def __init__(self, notifications:List[NotificationInterface]):
+		self.notifications = notifications
+
+	def send(self, message)->None:
+		for notification in self.notifications:
+			notification.send(message)
+
+class NotificationFactoryInterface(ABC):
+	def create(self, type:NotificationPreferenceEnum)->NotificationInterface:
+		pass
+
+class NotificationFactory(NotificationFactoryInterface):
+	def __init__(self, registry:NotificationRegistry=registry):
+		self.registry = registry
+
+	def create(self, user:User)->NotificationInterface:
+		return self.registry.get(user.notification_preference)
+
+class MultiNotificationFactory(NotificationFactoryInterface):
+	def __init__(self, registry:NotificationRegistry=registry):
+		self.registry = registry
+
+	def create(self, user:User)->NotificationInterface:
+		return MultiNotificaiton([
+			self.registry.get(preference) for preference in user.notification_preferences
+		])
+
+class Order:
+	def __init__(self, user:User, notificationFactory:NotificationFactoryInterface):
+		self.user = user
+		self.notification = notificationFactory.create(self.user)
+
+	def notify_user(self, message)->None:
+		self.notification.send(message)
+
+def main():
+	user = User()
+	notificationFactory = NotificationFactory()
+	order1 = Order(user, notificationFactory)
+	order2 = Order(user, notificationFactory)
+	order1.notify_user("Your order has been shipped")
+	print('orders share a notification: {}'.format(order1.notification is order2.notification))
+
+	multiNotificationFactory = MultiNotificationFactory()
+	order3 = Order(user, multiNotificationFactory)
+	order3.notify_user("Your order has been shipped")
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,179 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from enum import Enum
+from typing import Callable, Tuple
+
+'''
+The registry from example 7 stopped us from creating new
+notifications for every order.  But MultiNotificationFactory
+still builds a new list and a new MultiNotificaiton every time
+create() is called.
+
+Think about how many different MultiNotificaitons there can
+actually be.  Each user either has a preference or they don't,
+and there are 3 preferences.  That is 2 x 2 x 2 = 8 possible
+combinations.  So across millions of orders we are building
+the same 8 objects over and over again.
+
+Instead we are going to memoize them.  Memoizing means
+remembering the result of some work the first time, and handing
+back that same result whenever we are asked to do the same work
+again.
+
+First the factory turns the user's preferences into a key.
+[SMS, PUSH] and [PUSH, SMS, SMS] should give the same result,
+so the key is a frozenset, which ignores order and duplicates
+and can be used as a dictionary key.  The composite always
+sends in the order of NotificationPreferenceEnum, so it does
+not matter which order the user picked them in.
+
+Then the factory looks the key up in its cache.  If the
+composite is already there, that is all create() has to do.
+If not, it builds it once and stores it.
+
+Because everyone shares these composites, they must not be
+changed after they are built.  MultiNotificaiton now stores a
+tuple instead of a list so nobody can append to it.
+
+Two more details:
+
+	The cache is bounded.  Here there can only be 8 keys, but
+	with more notifications there could be a lot more, so the
+	cache only keeps max_size of them, throwing out whichever
+	was used longest ago.  This is called an LRU cache.
+
+	If a new notification is registered, any composite built
+	before might now be wrong.  The registry keeps a version
+	number that goes up on every register(), and the factory
+	empties its cache whenever the version changes.
+'''
+class User:
+	def __init__(self, notification_preferences:list|None=None):
+		#other config properties...
+		self.notification_preference = NotificationPreferenceEnum.SMS
+		self.notification_preferences = notification_preferences if notification_preferences is not None else [
+			NotificationPreferenceEnum.SMS,
+			NotificationPreferenceEnum.PUSH,
+			NotificationPreferenceEnum.EMAIL
+		]
+
+class NotificationPreferenceEnum(Enum):
+	EMAIL = 'EMAIL'
+	SMS = 'SMS'
+	PUSH = 'PUSH'
+
+class NotificationInterface(ABC):
+	@abstractmethod
+	def send(self, message:str)->None:
+		pass
+
+class NotificationRegistry:
+	def __init__(self):
+		self._notifications:dict[NotificationPreferenceEnum, NotificationInterface] = {}
+		self.version = 0
+
+	def register(self, preference:NotificationPreferenceEnum)->Callable[[type], type]:
+		def decorator(cls:type)->type:
+			self._notifications[preference] = cls()
+			self.version += 1
+			return cls
+		return decorator
+
+	def get(self, preference:NotificationPreferenceEnum)->NotificationInterface:
+		notification = self._notifications.get(preference)
+		if notification is None:
+			raise ValueError('no notification registered for {}'.format(preference))
+		return notification
+
+registry = NotificationRegistry()
+
+@registry.register(NotificationPreferenceEnum.EMAIL)
+class EmailNotification(NotificationInterface):
+	def send(self, message:str)->None:
+		print('sent from Email: {}'.format(message))
+
+@registry.register(NotificationPreferenceEnum.SMS)
+class SmsNotification(NotificationInterface):
+	def send(self, message:str)->None:
+		print('sent from SMS: {}'.format(message))
+
+@registry.register(NotificationPreferenceEnum.PUSH)
+class PushNotification(NotificationInterface):
+	def send(self, message:str)->None:
+		print('sent from Push: {}'.format(message))
+
+class MultiNotificaiton(NotificationInterface):
+	def __init__(self, notifications:Tuple[NotificationInterface, ...]):
+		self.notifications = notifications
+
+	def send(self, message)->None:
+		for notification in self.notifications:
+			notification.send(message)
+
+class NotificationFactoryInterface(ABC):
+	def create(self, type:NotificationPreferenceEnum)->NotificationInterface:
+		pass
+
+class NotificationFactory(NotificationFactoryInterface):
+	def __init__(self, registry:NotificationRegistry=registry):
+		self.registry = registry
+
+	def create(self, user:User)->NotificationInterface:
+		return self.registry.get(user.notification_preference)
+
+class MultiNotificationFactory(NotificationFactoryInterface):
+	def __init__(self, registry:NotificationRegistry=registry, max_size:int=64):
+		self.registry = registry
+		self.max_size = max_size
+		self._cache:OrderedDict[frozenset, MultiNotificaiton] = OrderedDict()
+		self._version = registry.version
+
+	def create(self, user:User)->NotificationInterface:
+		if self._version != self.registry.version:
+			self._cache.clear()
+			self._version = self.registry.version
+
+		key = frozenset(user.notification_preferences)
+		notification = self._cache.get(key)
+		if notification is not None:
+			self._cache.move_to_end(key)
+			return notification
+
+		notification = MultiNotificaiton(tuple(
+			self.registry.get(preference)
+			for preference in NotificationPreferenceEnum
+			if preference in key
+		))
+		self._cache[key] = notification
+		if len(self._cache) > self.max_size:
+			self._cache.popitem(last=False)
+		return notification
+
+class Order:
+	def __init__(self, user:User, notificationFactory:NotificationFactoryInterface):
+		self.user = user
+		self.notification = notificationFactory.create(self.user)
+
+	def notify_user(self, message)->None:
+		self.notification.send(message)
+
+def main():
+	notificationFactory = MultiNotificationFactory()
+	user1 = User([NotificationPreferenceEnum.SMS, NotificationPreferenceEnum.PUSH])
+	user2 = User([NotificationPreferenceEnum.PUSH, NotificationPreferenceEnum.SMS, NotificationPreferenceEnum.SMS])
+	order1 = Order(user1, notificationFactory)
+	order2 = Order(user2, notificationFactory)
+	order1.notify_user("Your order has been shipped")
+	print('orders share a notification: {}'.format(order1.notification is order2.notification))
+
+	#registering a replacement email notification empties the cache
+	@registry.register(NotificationPreferenceEnum.EMAIL)
+	class HtmlEmailNotification(NotificationInterface):
+		def send(self, message:str)->None:
+			print('sent from HTML Email: {}'.format(message))
+
+	order3 = Order(User(), notificationFactory)
+	order3.notify_user("Your order has been shipped")
+
+if __name__ == "__main__":
+	main()
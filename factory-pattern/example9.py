@@ -0,0 +1,250 @@
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Dict, List
+import asyncio
+import time
+
+'''
+Going back to the MultiNotificaiton from example 6, lets
+look at what send() actually does.  It sends the email, waits
+for it to finish, then sends the SMS, waits for it to finish,
+then sends the push notification.  In real life every one of
+those is a call to some outside provider that takes a while.
+If email takes 300ms, SMS 200ms and push 100ms, the user's
+notification takes 600ms, the SUM of all three.
+
+None of the channels depend on each other, so there is no
+reason to wait for one before starting the next.  If we start
+all three at the same time, the whole thing only takes as long
+as the slowest one, 300ms, the MAX of the three.
+
+We are going to write two versions of this, because which one
+you want depends on the rest of your program.
+
+ThreadedMultiNotification hands every channel's send() to a
+ThreadPoolExecutor, which runs them on separate threads.  This
+works anywhere.
+
+AsyncMultiNotification does the same thing with asyncio, for
+programs that are already running an event loop.  The channels
+are still regular blocking code, so each one is run in a thread
+with run_in_executor().  Inside a running loop, use send_async().
+send() is there for code that isn't async.  It starts its own
+loop and its own threads, and it doesn't wait for channels that
+timed out before it returns.
+
+Sending things in parallel brings up two new questions.
+
+	What if one channel hangs forever?  Each channel now has a
+	timeout.  If a channel does not finish in time we stop
+	waiting for it and mark it as timed out.  (We can't
+	actually stop a thread, so it keeps running in the
+	background, we just don't wait for it.)
+
+	What if one channel fails?  It should not stop the others.
+	So instead of returning nothing, send() now returns a
+	DeliveryReport, with one DeliveryResult per channel saying
+	whether it was sent, failed, or timed out, and how long it
+	took.
+
+Both of these still implement NotificationInterface, so the
+only change to Order is that notify_user() now hands back
+whatever send() returned, so the caller can look at the report.
+'''
+class User:
+	def __init__(self):
+		#other config properties...
+		self.notification_preference = NotificationPreferenceEnum.SMS
+		self.notification_preferences = [
+			NotificationPreferenceEnum.SMS,
+			NotificationPreferenceEnum.PUSH,
+			NotificationPreferenceEnum.EMAIL
+		]
+
+class NotificationPreferenceEnum(Enum):
+	EMAIL = 'EMAIL'
+	SMS = 'SMS'
+	PUSH = 'PUSH'
+
+class DeliveryStatusEnum(Enum):
+	SENT = 'SENT'
+	FAILED = 'FAILED'
+	TIMED_OUT = 'TIMED_OUT'
+
+@dataclass
+class DeliveryResult:
+	channel:str
+	status:DeliveryStatusEnum
+	seconds:float
+	error:Exception|None = None
+
+@dataclass
+class DeliveryReport:
+	results:List[DeliveryResult] = field(default_factory=list)
+
+	@property
+	def ok(self)->bool:
+		return all(result.status == DeliveryStatusEnum.SENT for result in self.results)
+
+class NotificationInterface(ABC):
+	@abstractmethod
+	def send(self, message:str)->None:
+		pass
+
+class EmailNotification(NotificationInterface):
+	def send(self, message:str)->None:
+		#pretend we are waiting on the email provider
+		time.sleep(0.3)
+		print('sent from Email: {}'.format(message))
+
+class SmsNotification(NotificationInterface):
+	def send(self, message:str)->None:
+		time.sleep(0.2)
+		print('sent from SMS: {}'.format(message))
+
+class PushNotification(NotificationInterface):
+	def send(self, message:str)->None:
+		time.sleep(0.1)
+		print('sent from Push: {}'.format(message))
+
+class MultiNotificaiton(NotificationInterface):
+	def __init__(self, notifications:List[NotificationInterface]):
+		self.notifications = notifications
+
+	def send(self, message)->None:
+		for notification in self.notifications:
+			notification.send(message)
+
+class ThreadedMultiNotification(NotificationInterface):
+	def __init__(self, notifications:List[NotificationInterface], executor:ThreadPoolExecutor,
+			timeouts:Dict[type, float]|None=None, default_timeout:float=1.0):
+		self.notifications = notifications
+		self.executor = executor
+		self.timeouts = timeouts if timeouts is not None else {}
+		self.default_timeout = default_timeout
+
+	def send(self, message)->DeliveryReport:
+		start = time.perf_counter()
+		futures = [
+			(notification, self.executor.submit(self._send_one, notification, message))
+			for notification in self.notifications
+		]
+
+		report = DeliveryReport()
+		for notification, future in futures:
+			deadline = start + self.timeouts.get(type(notification), self.default_timeout)
+			channel = type(notification).__name__
+			try:
+				finished = future.result(timeout=max(0, deadline - time.perf_counter()))
+				report.results.append(DeliveryResult(channel, DeliveryStatusEnum.SENT, finished - start))
+			except TimeoutError:
+				report.results.append(DeliveryResult(channel, DeliveryStatusEnum.TIMED_OUT, time.perf_counter() - start))
+			except Exception as e:
+				report.results.append(DeliveryResult(channel, DeliveryStatusEnum.FAILED, time.perf_counter() - start, e))
+		return report
+
+	def _send_one(self, notification:NotificationInterface, message)->float:
+		notification.send(message)
+		return time.perf_counter()
+
+class AsyncMultiNotification(NotificationInterface):
+	def __init__(self, notifications:List[NotificationInterface],
+			timeouts:Dict[type, float]|None=None, default_timeout:float=1.0,
+			executor:ThreadPoolExecutor|None=None):
+		self.notifications = notifications
+		self.timeouts = timeouts if timeouts is not None else {}
+		self.default_timeout = default_timeout
+		#None means the event loop's default executor
+		self.executor = executor
+
+	def send(self, message)->DeliveryReport:
+		#asyncio.run() waits for the default executor to finish, timed out channels included,
+		#so use our own threads and stop waiting for them as soon as the report is ready
+		executor = ThreadPoolExecutor(max_workers=max(1, len(self.notifications)))
+		try:
+			return asyncio.run(self._send_all(message, executor))
+		finally:
+			executor.shutdown(wait=False)
+
+	async def send_async(self, message)->DeliveryReport:
+		return await self._send_all(message, self.executor)
+
+	async def _send_all(self, message, executor:ThreadPoolExecutor|None)->DeliveryReport:
+		start = time.perf_counter()
+		results = await asyncio.gather(*(
+			self._send_one(notification, message, start, executor) for notification in self.notifications
+		))
+		return DeliveryReport(list(results))
+
+	async def _send_one(self, notification:NotificationInterface, message, start:float,
+			executor:ThreadPoolExecutor|None)->DeliveryResult:
+		channel = type(notification).__name__
+		timeout = self.timeouts.get(type(notification), self.default_timeout)
+		loop = asyncio.get_running_loop()
+		try:
+			await asyncio.wait_for(loop.run_in_executor(executor, notification.send, message), timeout)
+			return DeliveryResult(channel, DeliveryStatusEnum.SENT, time.perf_counter() - start)
+		except asyncio.TimeoutError:
+			return DeliveryResult(channel, DeliveryStatusEnum.TIMED_OUT, time.perf_counter() - start)
+		except Exception as e:
+			return DeliveryResult(channel, DeliveryStatusEnum.FAILED, time.perf_counter() - start, e)
+
+class NotificationFactoryInterface(ABC):
+	def create(self, type:NotificationPreferenceEnum)->NotificationInterface:
+		pass
+
+class ConcurrentNotificationFactory(NotificationFactoryInterface):
+	def __init__(self, executor:ThreadPoolExecutor, timeouts:Dict[type, float]|None=None):
+		self.executor = executor
+		self.timeouts = timeouts
+
+	def create(self, user:User)->NotificationInterface:
+		notifications = []
+		for preference in user.notification_preferences:
+			if preference == NotificationPreferenceEnum.EMAIL:
+				notifications.append(EmailNotification())
+			if preference == NotificationPreferenceEnum.SMS:
+				notifications.append(SmsNotification())
+			if preference == NotificationPreferenceEnum.PUSH:
+				notifications.append(PushNotification())
+
+		return ThreadedMultiNotification(notifications, self.executor, self.timeouts)
+
+class Order:
+	def __init__(self, user:User, notificationFactory:NotificationFactoryInterface):
+		self.user = user
+		self.notification = notificationFactory.create(self.user)
+
+	def notify_user(self, message):
+		return self.notification.send(message)
+
+def print_report(name:str, report:DeliveryReport|None, seconds:float):
+	print('{} took {:.2f}s'.format(name, seconds))
+	if report is not None:
+		for result in report.results:
+			print('\t{}: {} after {:.2f}s'.format(result.channel, result.status.value, result.seconds))
+
+def main():
+	user = User()
+	notifications = [EmailNotification(), SmsNotification(), PushNotification()]
+
+	start = time.perf_counter()
+	MultiNotificaiton(notifications).send("Your order has been shipped")
+	print_report('sequential', None, time.perf_counter() - start)
+
+	with ThreadPoolExecutor(max_workers=8) as executor:
+		#email is only given 250ms this time, so it times out
+		notificationFactory = ConcurrentNotificationFactory(executor, {EmailNotification: 0.25})
+		order = Order(user, notificationFactory)
+		start = time.perf_counter()
+		report = order.notify_user("Your order has been shipped")
+		print_report('threaded', report, time.perf_counter() - start)
+
+	start = time.perf_counter()
+	report = AsyncMultiNotification(notifications, {EmailNotification: 0.25}).send("Your order has been shipped")
+	print_report('asyncio', report, time.perf_counter() - start)
+
+if __name__ == "__main__":
+	main()
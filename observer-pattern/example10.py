@@ -0,0 +1,201 @@
+'''
+Remember the first problem from example 4?  In example 3
+the customer was notified on EVERY inventory event and had
+to look through the whole shipment itself to see if its
+widget was in there.  Example 4 solved that by notifying
+once per item, but that turns one shipment into a flood
+of events.  What if we want to keep one INVENTORY event
+per shipment, but still only bother the subscribers that
+actually care?
+
+The answer is to let the subscribers tell the observer
+what they care about up front, instead of filtering
+inside their callback.  When subscribing you can now pass
+a Predicate.  A predicate describes which receipts a
+subscriber is interested in:
+
+	item - the kind of item (or None for any item)
+	min_quantity - only notify if at least this many arrived
+	store_id - only notify for this store (or None for any store)
+
+Because the predicate is plain data instead of code hidden
+in a callback, the observer can build an index out of it.
+Subscribers are filed under a (store_id, item) key, and
+inside each key they are sorted by min_quantity.
+
+When a receipt comes in, the observer counts how many of
+each item arrived, and then only looks at the keys that
+could possibly match.  At most four keys per item: this
+store + this item, any store + this item, and the two
+"any item" keys.  Inside each key it stops as soon as it
+reaches a subscriber whose min_quantity is higher than
+what arrived.  Subscribers that can't match are never
+even looked at.
+
+The subscriber gets handed only the items that matched.
+'''
+from typing import TypeVar, Callable, Generic
+from abc import ABC, abstractmethod
+from enum import Enum
+from dataclasses import dataclass
+from collections import Counter
+import bisect
+import itertools
+
+
+T = TypeVar('T')
+
+class EventEnum(Enum):
+	INVENTORY = 'INVENTORY'
+
+class ItemEnum(Enum):
+	HAMMER ='HAMMER'
+	ROPE = 'ROPE'
+	WIDGET = 'WIDGET'
+	BASEBALL = 'BASEBALL'
+	CHEESE = 'CHEESE'
+
+
+@dataclass
+class Event(Generic[T]):
+	event:Enum
+	data:T
+
+@dataclass(frozen=True)
+class Predicate:
+	item:ItemEnum|None = None
+	min_quantity:int = 1
+	store_id:str|None = None
+
+class Item:
+	def __init__(self, name:ItemEnum):
+		self.name = name
+
+@dataclass
+class Receipt:
+	store_id:str
+	items:list[Item]
+
+class ObserverInterface(ABC):
+	@abstractmethod
+	def subscribe(self, subscriber:Callable, event:Enum, where:Predicate|None=None)->None:pass
+	@abstractmethod
+	def unsubscribe(self, subscriber:Callable, event:Enum)->None:pass
+	@abstractmethod
+	def notify(self, event:Event[Receipt])->None:pass
+
+class IndexedObserver(ObserverInterface):
+	def __init__(self):
+		#event -> (store_id, item) -> [(min_quantity, order, subscriber)]
+		self._index:dict[Enum, dict[tuple, list[tuple[int, int, Callable]]]] = {}
+		self._order = itertools.count()
+		self.checked:int = 0
+
+	def subscribe(self, subscriber:Callable, event:Enum, where:Predicate|None=None)->None:
+		where = where if where is not None else Predicate()
+		keys = self._index.setdefault(event, {})
+		subs = keys.setdefault((where.store_id, where.item), [])
+		bisect.insort(subs, (where.min_quantity, next(self._order), subscriber))
+
+	def unsubscribe(self, subscriber:Callable, event:Enum)->None:
+		keys = self._index.get(event)
+		if keys is not None:
+			for key, subs in list(keys.items()):
+				subs[:] = [entry for entry in subs if entry[2] != subscriber]
+				if len(subs)==0:
+					del keys[key]
+			if len(keys)==0:
+				del self._index[event]
+
+	def notify(self, event:Event[Receipt])->None:
+		keys = self._index.get(event.event)
+		if keys is None:
+			return
+
+		receipt = event.data
+		by_item:dict[ItemEnum, list[Item]] = {}
+		for item in receipt.items:
+			by_item.setdefault(item.name, []).append(item)
+		counts = Counter({name: len(items) for name, items in by_item.items()})
+
+		matches:list[tuple[int, Callable, list[Item]]] = []
+		for name, quantity in counts.items():
+			for key in ((receipt.store_id, name), (None, name)):
+				self._collect(keys.get(key), quantity, by_item[name], matches)
+		for key in ((receipt.store_id, None), (None, None)):
+			self._collect(keys.get(key), len(receipt.items), receipt.items, matches)
+
+		#call subscribers in the order they subscribed
+		matches.sort(key=lambda match: match[0])
+		for _, subscriber, items in matches:
+			subscriber(items)
+
+	def _collect(self, subs, quantity:int, items:list[Item], matches:list)->None:
+		if subs is None:
+			return
+		for min_quantity, order, subscriber in subs:
+			self.checked += 1
+			if min_quantity > quantity:
+				break
+			matches.append((order, subscriber, items))
+
+class Customer:
+	def __init__(self, name:str, observer:ObserverInterface):
+		self.name = name
+		observer.subscribe(self.get_widget, EventEnum.INVENTORY, Predicate(ItemEnum.WIDGET))
+
+	def get_widget(self, data:list[Item]):
+		print('Hey! {}\'s widget Arrived!!!'.format(self.name))
+
+class Restaurant:
+	def __init__(self, observer:ObserverInterface):
+		#only worth the trip if the north store got a lot of cheese
+		observer.subscribe(
+			self.buy_cheese,
+			EventEnum.INVENTORY,
+			Predicate(ItemEnum.CHEESE, min_quantity=3, store_id='north')
+		)
+
+	def buy_cheese(self, data:list[Item]):
+		print('buying {} cheeses'.format(len(data)))
+
+
+class Store:
+	def __init__(self, store_id:str, observer:ObserverInterface):
+		self.store_id = store_id
+		self.observer  = observer
+
+	def receive_inventory(self, inventory:list[Item])->None:
+		#do other receiving stuff
+		print('{} receiving inventory'.format(self.store_id))
+
+		self.observer.notify(
+			Event[Receipt](
+				EventEnum.INVENTORY,
+				Receipt(self.store_id, inventory)
+			)
+		)
+
+
+
+def main():
+	observer:IndexedObserver = IndexedObserver()
+	restaurant:Restaurant = Restaurant(observer)
+	#lots of customers waiting on widgets that have not shipped yet
+	customers = [Customer('Customer {}'.format(i), observer) for i in range(1000)]
+	#and lots of contractors only interested in bulk hammer deliveries
+	for _ in range(1000):
+		observer.subscribe(print, EventEnum.INVENTORY, Predicate(ItemEnum.HAMMER, min_quantity=100))
+	north:Store = Store('north', observer)
+	south:Store = Store('south', observer)
+
+	inventory1 = [Item(ItemEnum.HAMMER), Item(ItemEnum.BASEBALL), Item(ItemEnum.CHEESE)]
+	inventory2 = [Item(ItemEnum.CHEESE), Item(ItemEnum.CHEESE), Item(ItemEnum.CHEESE)]
+	south.receive_inventory(inventory2)
+	north.receive_inventory(inventory1)
+	north.receive_inventory(inventory2)
+	print('{} subscribers, {} checked'.format(len(customers) + 1001, observer.checked))
+
+
+if __name__ == "__main__":
+	main()
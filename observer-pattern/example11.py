@@ -0,0 +1,175 @@
+'''
+Back in example 3 the Customer subscribed itself to the
+observer by passing in self.get_widget.  That is a bound
+method, and a bound method holds a reference to the object
+it belongs to.  As long as the observer is holding onto
+the method, the customer can never be cleaned up by
+python, even after everything else has forgotten about it.
+
+In a store that runs for months, customers come and go
+all day long.  Every one of them stays in the observer
+forever, so memory just keeps growing.  This is a classic
+observer pattern memory leak.
+
+The fix is a weak reference.  A weak reference points at
+an object without keeping it alive.  When the object is
+cleaned up, the weak reference simply starts returning
+None.  For bound methods python gives us WeakMethod, which
+does the same thing for the object behind the method.
+
+subscribe() now takes a weak flag.  It is opt in, because
+sometimes you WANT the observer to keep something alive,
+like a lambda that nothing else is holding onto.
+
+Every subscriber is stored as a small function that gives
+back the real subscriber (or None if it has been cleaned
+up).  notify() calls it, skips the dead ones, and counts
+them.  Once at least half of an event's subscribers are
+dead it rebuilds that event's list without them.  Waiting
+for half means we only pay to clean up once in a while,
+and the cost of each clean up is covered by all the dead
+entries it removes.  This is what we call amortized.
+
+Finally the observer keeps a small history of how many
+subscribers it was holding each time it notified, so we
+can see if it is growing.
+'''
+from typing import TypeVar, Callable, Generic
+from abc import ABC, abstractmethod
+from enum import Enum
+from dataclasses import dataclass
+from collections import deque
+import inspect
+import time
+import weakref
+
+
+T = TypeVar('T')
+
+class EventEnum(Enum):
+	INVENTORY = 'INVENTORY'
+
+@dataclass
+class Event(Generic[T]):
+	event:EventEnum
+	data:T
+
+class ObserverInterface(ABC):
+	@abstractmethod
+	def subscribe(self, subscriber:Callable, event:EventEnum, weak:bool=False)->None:pass
+	@abstractmethod
+	def unsubscribe(self, subscriber:Callable, event:EventEnum)->None:pass
+	@abstractmethod
+	def notify(self, event:Event)->None:pass
+
+class WeakObserver(ObserverInterface):
+	def __init__(self, history_size:int=100):
+		self._subscribers:dict[EventEnum, list[Callable[[], Callable|None]]] = {}
+		self.size:int = 0
+		self.history:deque[tuple[float, int]] = deque(maxlen=history_size)
+
+	def subscribe(self, subscriber:Callable, event:EventEnum, weak:bool=False)->None:
+		if not weak:
+			ref = lambda: subscriber
+		elif inspect.ismethod(subscriber):
+			ref = weakref.WeakMethod(subscriber)
+		else:
+			ref = weakref.ref(subscriber)
+
+		subs = self._subscribers.get(event)
+		if subs is not None:
+			subs.append(ref)
+		else:
+			self._subscribers[event] = [ref]
+		self.size += 1
+
+	def unsubscribe(self, subscriber:Callable, event:EventEnum)->None:
+		subs = self._subscribers.get(event)
+		if subs is not None:
+			for i, ref in enumerate(subs):
+				if ref() == subscriber:
+					del subs[i]
+					self.size -= 1
+					break
+			if len(subs)==0:
+				del self._subscribers[event]
+
+	def notify(self, event:Event)->None:
+		subscribers = self._subscribers.get(event.event)
+
+		if subscribers is not None:
+			dead = 0
+			for ref in list(subscribers):
+				sub = ref()
+				if sub is None:
+					dead += 1
+					continue
+				sub(event.data)
+			if dead and dead * 2 >= len(subscribers):
+				self._purge(event.event)
+		self.history.append((time.monotonic(), self.size))
+
+	def _purge(self, event:EventEnum)->None:
+		#a subscriber may have unsubscribed during notify and taken the list with it
+		subs = self._subscribers.get(event)
+		if subs is None:
+			return
+		alive = [ref for ref in subs if ref() is not None]
+		self.size -= len(subs) - len(alive)
+		if len(alive)==0:
+			del self._subscribers[event]
+		else:
+			self._subscribers[event] = alive
+
+class Item:
+	def __init__(self, name:str):
+		self.name = name
+
+class Customer:
+	def __init__(self, name:str, observer:ObserverInterface):
+		self.name = name
+		observer.subscribe(self.get_widget, EventEnum.INVENTORY, weak=True)
+
+	def get_widget(self, data:list[Item]):
+		for item in data:
+			if item.name == "widget":
+				print('Hey! {}\'s widget Arrived!!!'.format(self.name))
+
+
+class Store:
+	def __init__(self, observer:ObserverInterface):
+		self.observer  = observer
+
+	def receive_inventory(self, inventory:list[Item])->None:
+		#do other receiving stuff
+		self.observer.notify(
+			Event[list[Item]](
+				EventEnum.INVENTORY,
+				inventory
+			)
+		)
+
+
+
+def main():
+	observer:WeakObserver = WeakObserver()
+	jake:Customer = Customer('Jake', observer)
+	store:Store = Store(observer)
+
+	inventory1 = [Item('hammer'), Item('milk'), Item('baseball')]
+	inventory2 = [Item('rope'), Item('cheese'), Item('widget')]
+
+	#a busy day.  customers come in, wait around, and leave
+	for day in range(5):
+		visitors = [Customer('Customer {}'.format(i), observer) for i in range(10000)]
+		store.receive_inventory(inventory1)
+		del visitors
+		store.receive_inventory(inventory1)
+		print('day {}: observer is holding {} subscribers'.format(day, observer.size))
+
+	store.receive_inventory(inventory2)
+	print('largest registry: {}'.format(max(size for _, size in observer.history)))
+
+
+if __name__ == "__main__":
+	main()
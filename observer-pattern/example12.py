@@ -0,0 +1,256 @@
+'''
+Every observer so far lives inside one python process.
+But a busy store runs its receiving on several worker
+processes so it can use every core on the machine.  A
+customer subscribed in one process never hears about a
+widget that was received in another process, because
+each process has its own observer.
+
+Thanks to the ObserverInterface, we can fix this without
+touching the Store or the InventoryManager at all.  We
+just need a new implementation of the interface.
+
+The ProcessEventBus is created once in the parent process.
+It makes one multiprocessing Queue (an inbox) for every
+process that is going to take part.  Each process then
+calls connect() to get its own ProcessObserver.
+
+	subscribe() / unsubscribe() - work exactly like before,
+		and only ever affect the process they were called in.
+		Subscribers are often closures and bound methods that
+		can't be sent to another process anyway.
+	notify() - does NOT call anyone.  It adds the event to a
+		batch.  When the batch is full, or flush_interval
+		seconds go by, the whole batch is pickled ONCE and the
+		bytes are dropped into every process's inbox, including
+		our own.
+	start() - starts a listener thread that reads batches out
+		of this process's inbox and calls the local subscribers.
+	close() - sends whatever is left in the batch, tells every
+		process we are done sending, and then waits until every
+		other process has said the same.  That way no process
+		stops listening while there are still events headed
+		its way.
+
+Batching matters here.  Sending something to another process
+means pickling it and pushing it through a pipe, and doing
+that for every single item is slow.  Pickling a batch of a
+hundred events is far cheaper than pickling a hundred events
+one at a time, and it is only done once no matter how many
+processes are listening.
+
+The subscriber lists are copy-on-write tuples, like example 7,
+since the listener thread reads them while the main thread
+might be subscribing.
+'''
+from typing import TypeVar, Callable, Generic
+from abc import ABC, abstractmethod
+from enum import Enum
+from dataclasses import dataclass
+import multiprocessing
+import pickle
+import threading
+
+
+T = TypeVar('T')
+
+class EventEnum(Enum):
+	INVENTORY = 'INVENTORY'
+
+class ItemEnum(Enum):
+	HAMMER ='HAMMER'
+	ROPE = 'ROPE'
+	WIDGET = 'WIDGET'
+	BASEBALL = 'BASEBALL'
+	CHEESE = 'CHEESE'
+
+
+@dataclass
+class Event(Generic[T]):
+	event:Enum
+	data:T
+
+class ObserverInterface(ABC):
+	@abstractmethod
+	def subscribe(self, subscriber:Callable, event:Enum)->None:pass
+	@abstractmethod
+	def unsubscribe(self, subscriber:Callable, event:Enum)->None:pass
+	@abstractmethod
+	def notify(self, event:Event)->None:pass
+
+class ProcessObserver(ObserverInterface):
+	def __init__(self, inbox, outboxes:list, batch_size:int=100, flush_interval:float=0.05):
+		self._subscribers:dict[Enum, tuple[Callable, ...]] = {}
+		self._lock = threading.Lock()
+		self._inbox = inbox
+		self._outboxes = outboxes
+		self._batch_size = batch_size
+		self._flush_interval = flush_interval
+		self._pending:list[Event] = []
+		self._pending_lock = threading.Lock()
+		self._closed = threading.Event()
+		self._listener = threading.Thread(target=self._listen, daemon=True)
+		self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+
+	def subscribe(self, subscriber:Callable, event:Enum)->None:
+		with self._lock:
+			subs = self._subscribers.get(event, ())
+			self._subscribers[event] = subs + (subscriber,)
+
+	def unsubscribe(self, subscriber:Callable, event:Enum)->None:
+		with self._lock:
+			subs = self._subscribers.get(event)
+			if subs is not None:
+				index = subs.index(subscriber)
+				subs = subs[:index] + subs[index + 1:]
+				if len(subs)==0:
+					del self._subscribers[event]
+				else:
+					self._subscribers[event] = subs
+
+	def notify(self, event:Event)->None:
+		with self._pending_lock:
+			self._pending.append(event)
+			if len(self._pending) >= self._batch_size:
+				self._send()
+
+	def flush(self)->None:
+		with self._pending_lock:
+			if self._pending:
+				self._send()
+
+	def start(self)->None:
+		self._listener.start()
+		self._flusher.start()
+
+	def close(self)->None:
+		self._closed.set()
+		self._flusher.join()
+		self.flush()
+		#tell every process we are done sending.  our listener keeps
+		#going until every process, including us, has said goodbye
+		for outbox in self._outboxes:
+			outbox.put(None)
+		self._listener.join()
+
+	def _send(self)->None:
+		#called while holding _pending_lock so batches go out in order
+		payload = pickle.dumps(self._pending, pickle.HIGHEST_PROTOCOL)
+		self._pending = []
+		for outbox in self._outboxes:
+			outbox.put(payload)
+
+	def _flush_periodically(self)->None:
+		while not self._closed.wait(self._flush_interval):
+			self.flush()
+
+	def _listen(self)->None:
+		goodbyes = 0
+		while goodbyes < len(self._outboxes):
+			payload = self._inbox.get()
+			if payload is None:
+				goodbyes += 1
+				continue
+			for event in pickle.loads(payload):
+				subscribers = self._subscribers.get(event.event)
+				if subscribers is not None:
+					for sub in subscribers:
+						try:
+							sub(event.data)
+						except Exception as e:
+							#one bad subscriber must not stop delivery for the whole process
+							print('subscriber failed: {!r}'.format(e))
+
+class ProcessEventBus:
+	def __init__(self, processes:int):
+		self._inboxes = [multiprocessing.Queue() for _ in range(processes)]
+
+	def connect(self, index:int, batch_size:int=100, flush_interval:float=0.05)->ProcessObserver:
+		return ProcessObserver(self._inboxes[index], self._inboxes, batch_size, flush_interval)
+
+class Item:
+	def __init__(self, name:ItemEnum):
+		self.name = name
+
+class InventoryManagerInterface(ABC):
+	@abstractmethod
+	def receive(self, inventory:list[Item])->None:pass
+	@abstractmethod
+	def notify_item_received(self, item:Item)->None:pass
+
+class InventoryManager(InventoryManagerInterface):
+	def __init__(self, observer:ObserverInterface):
+		self.observer = observer
+
+	def receive(self, inventory:list[Item])->None:
+		for item in inventory:
+			#other receiving functions
+			self.notify_item_received(item)
+
+	def notify_item_received(self, item:Item)->None:
+		self.observer.notify(Event[Item](item.name, item))
+
+class Customer:
+	def __init__(self, name:str):
+		self.name = name
+		self.arrived = threading.Event()
+
+	def get_widget(self, item:Item):
+		print('Hey! {}\'s widget Arrived!!! (process {})'.format(
+			self.name, multiprocessing.current_process().name
+		))
+		self.arrived.set()
+
+
+class Store:
+	def __init__(self, observer:ObserverInterface, inventoryManager:InventoryManagerInterface):
+		self.observer:ObserverInterface = observer
+		self.inventoryManager:InventoryManagerInterface  = inventoryManager
+
+	def receive_inventory(self, inventory:list[Item])->None:
+		#do other receiving stuff
+		self.inventoryManager.receive(inventory)
+
+	def subscribe_customer_to_item(self, subscriber:Callable, item:Item):
+		def func (data) :
+			subscriber(data)
+			self.observer.unsubscribe(func, item.name)
+		self.observer.subscribe(func, item.name)
+
+
+
+def front_desk(bus:ProcessEventBus, index:int):
+	observer:ProcessObserver = bus.connect(index)
+	store:Store = Store(observer, InventoryManager(observer))
+	jake:Customer = Customer('Jake')
+	store.subscribe_customer_to_item(jake.get_widget, Item(ItemEnum.WIDGET))
+	observer.start()
+
+	jake.arrived.wait(timeout=10)
+	observer.close()
+
+def receiving_dock(bus:ProcessEventBus, index:int):
+	observer:ProcessObserver = bus.connect(index)
+	store:Store = Store(observer, InventoryManager(observer))
+	observer.start()
+
+	inventory = [Item(name) for name in ItemEnum for _ in range(1000)]
+	store.receive_inventory(inventory)
+	print('dock {} received {} items'.format(index, len(inventory)))
+	observer.close()
+
+def main():
+	bus:ProcessEventBus = ProcessEventBus(3)
+	processes = [
+		multiprocessing.Process(target=front_desk, args=(bus, 0), name='front desk'),
+		multiprocessing.Process(target=receiving_dock, args=(bus, 1), name='dock 1'),
+		multiprocessing.Process(target=receiving_dock, args=(bus, 2), name='dock 2'),
+	]
+	for process in processes:
+		process.start()
+	for process in processes:
+		process.join()
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,390 @@
+'''
+Everything our observers know lives in memory.  If the
+process restarts, any event that was being delivered is
+gone, and worse, every customer waiting on a one-shot
+item subscription is forgotten.  Jake is never told his
+widget arrived.
+
+To survive a restart we are going to write everything the
+observer does to an event log on disk before doing it.
+The log is append-only, meaning we only ever add to the end
+of it, which is the fastest way to write to a disk.
+
+There are four kinds of records:
+
+	SUBSCRIBE - a subscription was added
+	UNSUBSCRIBE - a subscription was removed (or a one-shot fired)
+	EVENT - an event is about to be delivered
+	ACK - that event finished being delivered
+
+Each record is a small binary header (kind, length, checksum)
+followed by the payload.  This is much smaller and faster to
+read back than something like JSON.  The checksum lets us
+notice a record that was only half written when the power
+went out, and ignore it.
+
+Closures and bound methods can't be written to a file, so
+subscribers now have names.  The application registers the
+real function under a name with register(), and subscribes
+using that name.
+
+Writing to the disk is cheap.  Making SURE it is on the disk
+(fsync) is slow.  Rather than fsync after every record, the
+observer collects records and commits them as a group, once
+group_size records are waiting or every commit_interval
+seconds, whichever comes first.  This is called group commit.
+It trades a tiny window of possible loss for a huge speed up.
+
+At startup, replay() opens the log with mmap.  mmap lets us
+treat the file like one big bytes object without reading it
+into memory first, so scanning millions of records is just
+a loop over struct.unpack_from.  Replay rebuilds all of the
+subscriptions, and re-delivers any EVENT that never got
+its ACK, meaning it was in flight when the process died.
+When a one-shot subscription fires, its UNSUBSCRIBE is only
+written after the handler has run, right before the ACK.  So if
+the process dies mid-delivery, replay still has the one-shot
+and hands it the event again, instead of losing it.
+It returns the offset it stopped at.  You can also hand it an
+offset to start from, just remember that anything recorded
+before that offset, subscriptions included, is skipped.  The
+records before it are still skimmed (just their headers and
+numbers) so new tokens and sequence numbers carry on from the
+whole log instead of starting over.  replay() has to be called
+before anything else, since it is what opens the log.
+'''
+from typing import TypeVar, Callable, Generic
+from abc import ABC, abstractmethod
+from enum import Enum
+from dataclasses import dataclass
+import itertools
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+
+
+T = TypeVar('T')
+
+class EventEnum(Enum):
+	INVENTORY = 'INVENTORY'
+
+class ItemEnum(Enum):
+	HAMMER ='HAMMER'
+	ROPE = 'ROPE'
+	WIDGET = 'WIDGET'
+	BASEBALL = 'BASEBALL'
+	CHEESE = 'CHEESE'
+
+
+@dataclass
+class Event(Generic[T]):
+	event:Enum
+	data:T
+
+@dataclass
+class Subscription:
+	token:int
+	event:Enum
+	name:str
+	once:bool = False
+
+class RecordEnum(Enum):
+	SUBSCRIBE = 1
+	UNSUBSCRIBE = 2
+	EVENT = 3
+	ACK = 4
+
+class Item:
+	def __init__(self, name:ItemEnum):
+		self.name = name
+
+class EventCodecInterface(ABC):
+	@abstractmethod
+	def encode_key(self, event:Enum)->bytes:pass
+	@abstractmethod
+	def decode_key(self, data:bytes)->Enum:pass
+	@abstractmethod
+	def encode(self, event:Event)->bytes:pass
+	@abstractmethod
+	def decode(self, data:bytes)->Event:pass
+
+class ItemEventCodec(EventCodecInterface):
+	def encode_key(self, event:Enum)->bytes:
+		return event.value.encode()
+
+	def decode_key(self, data:bytes)->Enum:
+		return ItemEnum(data.decode())
+
+	def encode(self, event:Event)->bytes:
+		#the item is fully described by its name
+		return self.encode_key(event.event)
+
+	def decode(self, data:bytes)->Event:
+		name = self.decode_key(data)
+		return Event[Item](name, Item(name))
+
+class ObserverInterface(ABC):
+	@abstractmethod
+	def subscribe(self, name:str, event:Enum, once:bool=False)->int:pass
+	@abstractmethod
+	def unsubscribe(self, token:int)->None:pass
+	@abstractmethod
+	def notify(self, event:Event)->None:pass
+
+class DurableObserver(ObserverInterface):
+	HEADER = struct.Struct('<BII')
+	TOKEN = struct.Struct('<I')
+	SUBSCRIBE = struct.Struct('<IBB')
+
+	def __init__(self, path:str, codec:EventCodecInterface, group_size:int=1000, commit_interval:float=0.01):
+		self._path = path
+		self._codec = codec
+		self._group_size = group_size
+		self._commit_interval = commit_interval
+		self._handlers:dict[str, Callable] = {}
+		self._subscribers:dict[Enum, dict[int, Subscription]] = {}
+		self._subscriptions:dict[int, Subscription] = {}
+		self._tokens = itertools.count()
+		self._sequence = itertools.count()
+		self._buffer = bytearray()
+		self._buffered = 0
+		self._lock = threading.Lock()
+		self._file = None
+		self._closed = threading.Event()
+		self._committer = threading.Thread(target=self._commit_periodically, daemon=True)
+
+	def register(self, name:str, handler:Callable)->None:
+		self._handlers[name] = handler
+
+	def replay(self, offset:int=0)->int:
+		size = os.path.getsize(self._path) if os.path.exists(self._path) else 0
+		if not 0 <= offset <= size:
+			raise ValueError('offset {} is outside of the {} byte log'.format(offset, size))
+
+		#sequence -> where the event's payload is, only decoded if it was never acked
+		pending:dict[int, tuple[int, int]] = {}
+		events:dict[int, Event] = {}
+		kinds = {kind.value for kind in RecordEnum}
+		last_token = -1
+		last_sequence = -1
+		end = 0
+
+		if size:
+			with open(self._path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as log:
+				while end + self.HEADER.size <= size:
+					kind, length, checksum = self.HEADER.unpack_from(log, end)
+					start = end + self.HEADER.size
+					if kind not in kinds or length < self.TOKEN.size or start + length > size:
+						#a torn write from a crash, everything after it is junk
+						break
+
+					if start < offset:
+						#before the offset we only need the token or sequence, so the
+						#counters carry on from the whole log and never hand out one twice
+						end = start + length
+						number, = self.TOKEN.unpack_from(log, start)
+						if kind == RecordEnum.EVENT.value:
+							last_sequence = max(last_sequence, number)
+						elif kind == RecordEnum.SUBSCRIBE.value:
+							last_token = max(last_token, number)
+						continue
+
+					payload = log[start:start + length]
+					if zlib.crc32(payload) != checksum:
+						break
+					end = start + length
+
+					if kind == RecordEnum.EVENT.value:
+						sequence, = self.TOKEN.unpack_from(payload)
+						pending[sequence] = (start + self.TOKEN.size, end)
+						last_sequence = max(last_sequence, sequence)
+					elif kind == RecordEnum.ACK.value:
+						sequence, = self.TOKEN.unpack_from(payload)
+						pending.pop(sequence, None)
+					elif kind == RecordEnum.SUBSCRIBE.value:
+						token, once, key_length = self.SUBSCRIBE.unpack_from(payload)
+						key_start = self.SUBSCRIBE.size
+						event = self._codec.decode_key(payload[key_start:key_start + key_length])
+						name = payload[key_start + key_length:].decode()
+						self._add(Subscription(token, event, name, bool(once)))
+						last_token = max(last_token, token)
+					elif kind == RecordEnum.UNSUBSCRIBE.value:
+						token, = self.TOKEN.unpack_from(payload)
+						self._remove(token)
+
+				for sequence, (start, stop) in pending.items():
+					events[sequence] = self._codec.decode(log[start:stop])
+
+		self._tokens = itertools.count(last_token + 1)
+		self._sequence = itertools.count(last_sequence + 1)
+		self._open(end, size)
+
+		for sequence, event in events.items():
+			self._deliver(sequence, event)
+		return end
+
+	def subscribe(self, name:str, event:Enum, once:bool=False)->int:
+		subscription = Subscription(next(self._tokens), event, name, once)
+		key = self._codec.encode_key(event)
+		self._append(
+			RecordEnum.SUBSCRIBE,
+			self.SUBSCRIBE.pack(subscription.token, once, len(key)) + key + name.encode()
+		)
+		self._add(subscription)
+		return subscription.token
+
+	def unsubscribe(self, token:int)->None:
+		if token in self._subscriptions:
+			self._append(RecordEnum.UNSUBSCRIBE, self.TOKEN.pack(token))
+			self._remove(token)
+
+	def notify(self, event:Event)->None:
+		sequence = next(self._sequence)
+		self._append(RecordEnum.EVENT, self.TOKEN.pack(sequence) + self._codec.encode(event))
+		self._deliver(sequence, event)
+
+	def commit(self)->None:
+		with self._lock:
+			if self._buffered:
+				self._file.write(self._buffer)
+				self._file.flush()
+				os.fsync(self._file.fileno())
+				self._buffer.clear()
+				self._buffered = 0
+
+	def close(self)->None:
+		self._closed.set()
+		self._committer.join()
+		self.commit()
+		self._file.close()
+
+	def _open(self, end:int, size:int)->None:
+		self._file = open(self._path, 'ab')
+		if end < size:
+			#drop the torn record at the end before we start appending
+			self._file.truncate(end)
+		self._committer.start()
+
+	def _deliver(self, sequence:int, event:Event)->None:
+		subscribers = self._subscribers.get(event.event)
+
+		fired = []
+		if subscribers is not None:
+			for subscription in list(subscribers.values()):
+				if subscription.once:
+					#forget it now so it can't fire twice, but only log that it fired once the handler is done
+					self._remove(subscription.token)
+					fired.append(subscription.token)
+				self._handlers[subscription.name](event.data)
+		#if we crash before these are written, replay still has the one-shots and delivers the event again
+		for token in fired:
+			self._append(RecordEnum.UNSUBSCRIBE, self.TOKEN.pack(token))
+		self._append(RecordEnum.ACK, self.TOKEN.pack(sequence))
+
+	def _append(self, kind:RecordEnum, payload:bytes)->None:
+		if self._file is None:
+			raise RuntimeError('call replay() before using the observer, it opens the log')
+		with self._lock:
+			self._buffer += self.HEADER.pack(kind.value, len(payload), zlib.crc32(payload))
+			self._buffer += payload
+			self._buffered += 1
+			full = self._buffered >= self._group_size
+		if full:
+			self.commit()
+
+	def _commit_periodically(self)->None:
+		while not self._closed.wait(self._commit_interval):
+			self.commit()
+
+	def _add(self, subscription:Subscription)->None:
+		self._subscriptions[subscription.token] = subscription
+		subs = self._subscribers.get(subscription.event)
+		if subs is not None:
+			subs[subscription.token] = subscription
+		else:
+			self._subscribers[subscription.event] = {subscription.token: subscription}
+
+	def _remove(self, token:int)->None:
+		subscription = self._subscriptions.pop(token, None)
+		if subscription is None:
+			return
+		subs = self._subscribers[subscription.event]
+		del subs[token]
+		if len(subs)==0:
+			del self._subscribers[subscription.event]
+
+class InventoryManagerInterface(ABC):
+	@abstractmethod
+	def receive(self, inventory:list[Item])->None:pass
+	@abstractmethod
+	def notify_item_received(self, item:Item)->None:pass
+
+class InventoryManager(InventoryManagerInterface):
+	def __init__(self, observer:ObserverInterface):
+		self.observer = observer
+
+	def receive(self, inventory:list[Item])->None:
+		for item in inventory:
+			#other receiving functions
+			self.notify_item_received(item)
+
+	def notify_item_received(self, item:Item)->None:
+		self.observer.notify(Event[Item](item.name, item))
+
+class Customer:
+	def __init__(self, name:str):
+		self.name = name
+
+	def get_widget(self, item:Item):
+		print('Hey! {}\'s widget Arrived!!!'.format(self.name))
+
+
+class Store:
+	def __init__(self, observer:ObserverInterface, inventoryManager:InventoryManagerInterface):
+		self.observer:ObserverInterface = observer
+		self.inventoryManager:InventoryManagerInterface  = inventoryManager
+
+	def receive_inventory(self, inventory:list[Item])->None:
+		#do other receiving stuff
+		self.inventoryManager.receive(inventory)
+
+	def subscribe_customer_to_item(self, name:str, item:Item)->int:
+		return self.observer.subscribe(name, item.name, once=True)
+
+
+
+def start_store(path:str)->tuple[DurableObserver, Store]:
+	observer:DurableObserver = DurableObserver(path, ItemEventCodec())
+	#handlers have to be registered before replaying so replayed events can reach them
+	observer.register('jake.get_widget', Customer('Jake').get_widget)
+	start = time.perf_counter()
+	offset = observer.replay()
+	print('replayed {} bytes in {:.3f}s'.format(offset, time.perf_counter() - start))
+	return observer, Store(observer, InventoryManager(observer))
+
+def main():
+	path = os.path.join(tempfile.mkdtemp(), 'events.log')
+
+	observer, store = start_store(path)
+	store.subscribe_customer_to_item('jake.get_widget', Item(ItemEnum.WIDGET))
+	store.receive_inventory([Item(name) for name in ItemEnum if name != ItemEnum.WIDGET] * 50000)
+	observer.commit()
+	print('crash!')
+	#the process dies here without closing.  the subscription is in the log
+
+	observer, store = start_store(path)
+	store.receive_inventory([Item(ItemEnum.ROPE), Item(ItemEnum.WIDGET), Item(ItemEnum.WIDGET)])
+	observer.close()
+
+	#one more restart. jake's one-shot already fired, so he stays quiet
+	observer, store = start_store(path)
+	store.receive_inventory([Item(ItemEnum.WIDGET)])
+	observer.close()
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,332 @@
+'''
+We have made a lot of changes to notify() at this point,
+and we have been guessing about which ones are fast.  We
+have no way to see how long notify() spends on each event,
+which subscribers are slow, or whether a change made
+things worse.
+
+First we add instrumentation.  The InstrumentedObserver
+takes an optional hooks object that implements
+DispatchHooksInterface:
+
+	on_notify() - called once per event with how many
+		subscribers it was delivered to
+	on_delivered() - called after each subscriber with how
+		long that subscriber took
+
+DispatchStats is the hooks implementation we ship.  It
+counts dispatches per event, keeps a latency histogram per
+subscriber, and prints a warning when a subscriber takes
+longer than slow_threshold seconds.
+
+The histogram does not store every timing.  It sorts them
+into buckets that double in size (under 1 microsecond,
+under 2, under 4...) and just counts how many land in each
+bucket.  That is a fixed, small amount of memory no matter
+how many events go by, and it still tells us how the
+timings are spread out.
+
+When no hooks are given, notify() checks that ONCE per
+event and then runs the exact same loop as example 4.  No
+timers are read and no extra functions are called, so
+turning instrumentation off costs next to nothing.
+
+Second we add a benchmark.  benchmark() drives the observer
+with different numbers of subscribers, different batch sizes
+(how many items each event carries, like example 6), and
+different event rates, with and without hooks.  Every
+subscriber walks through all of the items it is given, so
+bigger batches really do cost more.
+
+The rate is how many events per second are offered.  'max'
+sends them as fast as possible and shows how many events and
+items per second notify() can push through.  The paced rates
+send events on a fixed schedule, like a real stream of
+shipments, and show how busy the observer is at that rate
+(the share of time spent inside notify) and the most it fell
+behind schedule.  Busy close to 100% or a growing lag means
+that rate is too much for that setup.  Run it before and after
+changing the dispatch code and compare.
+
+	python example14.py          - runs the store demo
+	python example14.py bench    - runs the benchmark
+'''
+from typing import TypeVar, Callable, Generic
+from abc import ABC, abstractmethod
+from enum import Enum
+from dataclasses import dataclass
+from collections import Counter
+import math
+import sys
+import time
+
+
+T = TypeVar('T')
+
+class EventEnum(Enum):
+	INVENTORY = 'INVENTORY'
+
+class ItemEnum(Enum):
+	HAMMER ='HAMMER'
+	ROPE = 'ROPE'
+	WIDGET = 'WIDGET'
+	BASEBALL = 'BASEBALL'
+	CHEESE = 'CHEESE'
+
+
+@dataclass
+class Event(Generic[T]):
+	event:Enum
+	data:T
+
+class DispatchHooksInterface(ABC):
+	@abstractmethod
+	def on_notify(self, event:Event, subscribers:int)->None:pass
+	@abstractmethod
+	def on_delivered(self, event:Event, subscriber:Callable, seconds:float)->None:pass
+
+class Histogram:
+	#bucket n holds timings under 2**n microseconds
+	def __init__(self):
+		self.buckets:Counter[int] = Counter()
+		self.count = 0
+		self.total = 0.0
+
+	def record(self, seconds:float)->None:
+		micros = seconds * 1_000_000
+		self.buckets[0 if micros < 1 else math.ceil(math.log2(micros))] += 1
+		self.count += 1
+		self.total += seconds
+
+	def percentile(self, percent:float)->float:
+		#upper edge of the bucket the percentile falls in, in seconds
+		target = self.count * percent / 100
+		seen = 0
+		for bucket in sorted(self.buckets):
+			seen += self.buckets[bucket]
+			if seen >= target:
+				return 2 ** bucket / 1_000_000
+		return 0.0
+
+class DispatchStats(DispatchHooksInterface):
+	def __init__(self, slow_threshold:float=0.1):
+		self.slow_threshold = slow_threshold
+		self.dispatches:Counter[Enum] = Counter()
+		self.latencies:dict[Callable, Histogram] = {}
+
+	def on_notify(self, event:Event, subscribers:int)->None:
+		self.dispatches[event.event] += 1
+
+	def on_delivered(self, event:Event, subscriber:Callable, seconds:float)->None:
+		histogram = self.latencies.get(subscriber)
+		if histogram is None:
+			histogram = self.latencies[subscriber] = Histogram()
+		histogram.record(seconds)
+		if seconds > self.slow_threshold:
+			print('warning: slow subscriber {} took {:.3f}s on {}'.format(
+				getattr(subscriber, '__qualname__', subscriber), seconds, event.event
+			))
+
+	def report(self)->None:
+		for event, count in self.dispatches.items():
+			print('{}: {} dispatches'.format(event, count))
+		for subscriber, histogram in self.latencies.items():
+			print('{}: {} calls, avg {:.6f}s, p50 < {:.6f}s, p99 < {:.6f}s'.format(
+				getattr(subscriber, '__qualname__', subscriber),
+				histogram.count,
+				histogram.total / histogram.count,
+				histogram.percentile(50),
+				histogram.percentile(99)
+			))
+
+class ObserverInterface(ABC):
+	@abstractmethod
+	def subscribe(self, subscriber:Callable, event:Enum)->None:pass
+	@abstractmethod
+	def unsubscribe(self, subscriber:Callable, event:Enum)->None:pass
+	@abstractmethod
+	def notify(self, event:Event)->None:pass
+
+class InstrumentedObserver(ObserverInterface):
+	def __init__(self, hooks:DispatchHooksInterface|None=None):
+		self._subscribers:dict[Enum, tuple[Callable, ...]] = {}
+		self.hooks = hooks
+
+	def subscribe(self, subscriber:Callable, event:Enum)->None:
+		subs = self._subscribers.get(event, ())
+		self._subscribers[event] = subs + (subscriber,)
+
+	def unsubscribe(self, subscriber:Callable, event:Enum)->None:
+		subs = self._subscribers.get(event)
+		if subs is not None:
+			index = subs.index(subscriber)
+			subs = subs[:index] + subs[index + 1:]
+			if len(subs)==0:
+				del self._subscribers[event]
+			else:
+				self._subscribers[event] = subs
+
+	def notify(self, event:Event)->None:
+		subscribers = self._subscribers.get(event.event)
+
+		if subscribers is not None:
+			hooks = self.hooks
+			if hooks is None:
+				for sub in subscribers:
+					sub(event.data)
+				return
+
+			hooks.on_notify(event, len(subscribers))
+			for sub in subscribers:
+				start = time.perf_counter()
+				sub(event.data)
+				hooks.on_delivered(event, sub, time.perf_counter() - start)
+
+class Item:
+	def __init__(self, name:ItemEnum):
+		self.name = name
+
+class InventoryManagerInterface(ABC):
+	@abstractmethod
+	def receive(self, inventory:list[Item])->None:pass
+	@abstractmethod
+	def notify_item_received(self, item:Item)->None:pass
+
+class InventoryManager(InventoryManagerInterface):
+	def __init__(self, observer:ObserverInterface):
+		self.observer = observer
+
+	def receive(self, inventory:list[Item])->None:
+		for item in inventory:
+			#other receiving functions
+			self.notify_item_received(item)
+
+	def notify_item_received(self, item:Item)->None:
+		self.observer.notify(Event[Item](item.name, item))
+
+class Customer:
+	def __init__(self, name:str):
+		self.name = name
+
+	def get_widget(self, item:Item):
+		#pretend we are sending this customer an email
+		time.sleep(0.15)
+		print('Hey! my widget Arrived!!!')
+
+def count_cheese(item:Item):
+	pass
+
+
+class Store:
+	def __init__(self, observer:ObserverInterface, inventoryManager:InventoryManagerInterface):
+		self.observer:ObserverInterface = observer
+		self.inventoryManager:InventoryManagerInterface  = inventoryManager
+
+	def receive_inventory(self, inventory:list[Item])->None:
+		#do other receiving stuff
+		self.inventoryManager.receive(inventory)
+
+	def subscribe_customer_to_item(self, subscriber:Callable, item:Item):
+		def func (data) :
+			subscriber(data)
+			self.observer.unsubscribe(func, item.name)
+		self.observer.subscribe(func, item.name)
+
+
+
+def count_items(items:list[Item])->int:
+	#a subscriber that actually looks at every item in the batch
+	count = 0
+	for item in items:
+		if item.name == ItemEnum.CHEESE:
+			count += 1
+	return count
+
+def drive(observer:ObserverInterface, event:Event, rounds:int, rate:float|None)->tuple[float, float, float]:
+	#returns (seconds, seconds spent inside notify, worst lag behind schedule)
+	if rate is None:
+		start = time.perf_counter()
+		for _ in range(rounds):
+			observer.notify(event)
+		seconds = time.perf_counter() - start
+		return seconds, seconds, 0.0
+
+	clock = time.perf_counter
+	busy = 0.0
+	lag = 0.0
+	start = clock()
+	for i in range(rounds):
+		due = start + i / rate
+		now = clock()
+		if now < due:
+			#spin rather than sleep, sleep() is too coarse for sub-millisecond gaps
+			while clock() < due:
+				pass
+		else:
+			lag = max(lag, now - due)
+		before = clock()
+		observer.notify(event)
+		busy += clock() - before
+	return clock() - start, busy, lag
+
+def benchmark(
+	subscriber_counts:tuple[int, ...]=(1, 10, 100),
+	batch_sizes:tuple[int, ...]=(1, 10, 100),
+	rates:tuple[float|None, ...]=(None, 10000, 1000),
+	events:int=20000,
+	paced_seconds:float=0.1
+):
+	print('{:>11} {:>10} {:>6} {:>10} {:>12} {:>14} {:>6} {:>10}'.format(
+		'subscribers', 'batch size', 'hooks', 'rate', 'events/sec', 'items/sec', 'busy', 'max lag'
+	))
+	for subscriber_count in subscriber_counts:
+		for batch_size in batch_sizes:
+			batch = [Item(ItemEnum.CHEESE)] * batch_size
+			for rate in rates:
+				for hooks in (None, DispatchStats()):
+					observer = InstrumentedObserver(hooks)
+					for _ in range(subscriber_count):
+						observer.subscribe(count_items, ItemEnum.CHEESE)
+
+					#fewer events for the big runs so every row takes about as long,
+					#and paced runs only last paced_seconds
+					rounds = max(200, events // (subscriber_count * batch_size))
+					if rate is not None:
+						rounds = max(1, min(rounds, int(rate * paced_seconds)))
+					event = Event[list[Item]](ItemEnum.CHEESE, batch)
+					seconds, busy, lag = drive(observer, event, rounds, rate)
+
+					print('{:>11} {:>10} {:>6} {:>10} {:>12,.0f} {:>14,.0f} {:>5.0f}% {:>8.2f}ms'.format(
+						subscriber_count,
+						batch_size,
+						'on' if hooks else 'off',
+						'max' if rate is None else '{:,.0f}/s'.format(rate),
+						rounds / seconds,
+						rounds * batch_size / seconds,
+						100 * busy / seconds,
+						lag * 1000
+					))
+
+def main():
+	if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+		benchmark()
+		return
+
+	stats:DispatchStats = DispatchStats(slow_threshold=0.1)
+	observer:InstrumentedObserver = InstrumentedObserver(stats)
+	jake:Customer = Customer('Jake')
+	inventoryManager:InventoryManager = InventoryManager(observer)
+	store:Store = Store(observer, inventoryManager)
+	store.subscribe_customer_to_item(jake.get_widget, Item(ItemEnum.WIDGET))
+	observer.subscribe(count_cheese, ItemEnum.CHEESE)
+
+	inventory1 = [Item(ItemEnum.HAMMER), Item(ItemEnum.BASEBALL), Item(ItemEnum.CHEESE)]
+	inventory2 = [Item(ItemEnum.ROPE), Item(ItemEnum.CHEESE), Item(ItemEnum.WIDGET)]
+	store.receive_inventory(inventory1)
+	store.receive_inventory(inventory2)
+	store.receive_inventory(inventory2 * 1000)
+	stats.report()
+
+
+if __name__ == "__main__":
+	main()
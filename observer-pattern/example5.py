@@ -0,0 +1,253 @@
+'''
+Our observer from example 4 works, but it has one big
+weakness.  notify() calls every subscriber one after the
+other, on the same thread that is receiving inventory.
+If one of the subscribers is slow (say a customer callback
+that sends out an email) the whole InventoryManager.receive
+loop has to sit there and wait for it.  A shipment of
+thousands of items ends up going only as fast as the
+slowest listener.
+
+To fix this we are going to create an asyncio version of
+the observer.  The AsyncObserver keeps the same
+subscribe / unsubscribe methods, but notify() is now a
+coroutine, and we add a notify_nowait() method.
+
+	notify() - hands the event off to be delivered and
+		returns right away.  If there are already too many
+		events waiting to be delivered (max_pending) it will
+		wait until there is room.  This is called backpressure,
+		it keeps a huge shipment from piling up millions of
+		undelivered events in memory.
+	notify_nowait() - same as notify(), but instead of
+		waiting when there is no room it raises
+		asyncio.QueueFull.  Useful in plain functions and
+		callbacks that can't await.  It still needs a running
+		event loop to deliver on, and raises RuntimeError
+		without one.
+	join() - waits until every event handed to the
+		observer has been delivered.
+
+Each event is delivered to all of its subscribers at the
+same time.  max_concurrency limits how many subscribers of
+a single event are allowed to run at once.  Subscribers can
+be coroutine functions OR plain functions.  Plain functions
+are run in the event loop's executor so that a blocking
+subscriber does not block everyone else.
+
+Notice the one-shot wrapper in the store is now a coroutine,
+and it remembers if it has already fired, then unsubscribes
+BEFORE it calls the subscriber.  Since events are now delivered
+concurrently, a second widget could already be on its way to
+the wrapper before the first notification is done, and we still
+only want the customer notified once.  Because the wrapper is a
+coroutine, the observer can't tell what it wraps, so the wrapper
+hands a plain subscriber to the executor itself, the same way the
+observer does.
+
+Counting the events that are waiting is a job for an
+asyncio.Semaphore with max_pending slots.  notify() takes a slot,
+and the slot is given back once the event has been delivered.
+'''
+from typing import TypeVar, Callable, Generic
+from abc import ABC, abstractmethod
+from enum import Enum
+from dataclasses import dataclass
+import asyncio
+import time
+
+
+T = TypeVar('T')
+
+class EventEnum(Enum):
+	INVENTORY = 'INVENTORY'
+
+class ItemEnum(Enum):
+	HAMMER ='HAMMER'
+	ROPE = 'ROPE'
+	WIDGET = 'WIDGET'
+	BASEBALL = 'BASEBALL'
+	CHEESE = 'CHEESE'
+
+
+@dataclass
+class Event(Generic[T]):
+	event:Enum
+	data:T
+
+class AsyncObserverInterface(ABC):
+	@abstractmethod
+	def subscribe(self, subscriber:Callable, event:Enum)->None:pass
+	@abstractmethod
+	def unsubscribe(self, subscriber:Callable, event:Enum)->None:pass
+	@abstractmethod
+	async def notify(self, event:Event)->None:pass
+	@abstractmethod
+	def notify_nowait(self, event:Event)->None:pass
+	@abstractmethod
+	async def join(self)->None:pass
+
+class AsyncObserver(AsyncObserverInterface):
+	def __init__(self, max_concurrency:int=10, max_pending:int=1000):
+		self._subscribers:dict[Enum, list[Callable]] = {}
+		self._max_concurrency = max_concurrency
+		#one slot per event that has not finished being delivered
+		self._pending = asyncio.Semaphore(max_pending)
+		self._tasks:set[asyncio.Task] = set()
+
+	def subscribe(self, subscriber:Callable, event:Enum)->None:
+		subs = self._subscribers.get(event)
+		if subs is not None:
+			subs.append(subscriber)
+		else:
+			self._subscribers[event] = [subscriber]
+
+	def unsubscribe(self, subscriber:Callable, event:Enum)->None:
+		subs = self._subscribers.get(event)
+		if subs is not None:
+			subs.remove(subscriber)
+			if len(subs)==0:
+				del self._subscribers[event]
+
+	async def notify(self, event:Event)->None:
+		loop = asyncio.get_running_loop()
+		await self._pending.acquire()
+		self._start_dispatch(loop, event)
+
+	def notify_nowait(self, event:Event)->None:
+		#raises RuntimeError before taking a slot if there is no running loop to deliver on
+		loop = asyncio.get_running_loop()
+		if self._pending.locked():
+			raise asyncio.QueueFull()
+		self._acquire_nowait()
+		self._start_dispatch(loop, event)
+
+	async def join(self)->None:
+		while self._tasks:
+			await asyncio.gather(*self._tasks)
+
+	def _acquire_nowait(self)->None:
+		#Semaphore has no acquire_nowait(), but when it is not locked acquire()
+		#takes the slot without ever suspending, so we can run it by hand
+		waiter = self._pending.acquire()
+		try:
+			waiter.send(None)
+		except StopIteration:
+			return
+		waiter.close()
+		raise RuntimeError('acquire() suspended even though a slot was free')
+
+	def _start_dispatch(self, loop:asyncio.AbstractEventLoop, event:Event)->None:
+		task = loop.create_task(self._dispatch(event))
+		self._tasks.add(task)
+		task.add_done_callback(self._tasks.discard)
+
+	async def _dispatch(self, event:Event)->None:
+		try:
+			#copy the list so subscribers can unsubscribe while we deliver
+			subscribers = list(self._subscribers.get(event.event, ()))
+			limit = asyncio.Semaphore(self._max_concurrency)
+			results = await asyncio.gather(
+				*(self._call(sub, event.data, limit) for sub in subscribers),
+				return_exceptions=True
+			)
+			for result in results:
+				if isinstance(result, Exception):
+					print('subscriber failed: {!r}'.format(result))
+		finally:
+			self._pending.release()
+
+	async def _call(self, subscriber:Callable, data, limit:asyncio.Semaphore)->None:
+		async with limit:
+			if asyncio.iscoroutinefunction(subscriber):
+				await subscriber(data)
+			else:
+				await asyncio.get_running_loop().run_in_executor(None, subscriber, data)
+
+class Item:
+	def __init__(self, name:ItemEnum):
+		self.name = name
+
+class InventoryManagerInterface(ABC):
+	@abstractmethod
+	async def receive(self, inventory:list[Item])->None:pass
+	@abstractmethod
+	async def notify_item_received(self, item:Item)->None:pass
+
+class InventoryManager(InventoryManagerInterface):
+	def __init__(self, observer:AsyncObserverInterface):
+		self.observer = observer
+
+	async def receive(self, inventory:list[Item])->None:
+		for item in inventory:
+			#other receiving functions
+			await self.notify_item_received(item)
+
+	async def notify_item_received(self, item:Item)->None:
+		await self.observer.notify(Event[Item](item.name, item))
+
+class Customer:
+	def __init__(self, name:str):
+		self.name = name
+
+	async def get_widget(self, item:Item):
+		#pretend we are sending this customer an email
+		await asyncio.sleep(0.5)
+		print('Hey! my widget Arrived!!!')
+
+def log_cheese(item:Item):
+	#a plain, blocking subscriber.  it runs in the executor
+	time.sleep(0.1)
+	print('logged {}'.format(item.name.value))
+
+
+class Store:
+	def __init__(self, observer:AsyncObserverInterface, inventoryManager:InventoryManagerInterface):
+		self.observer:AsyncObserverInterface = observer
+		self.inventoryManager:InventoryManagerInterface  = inventoryManager
+
+	async def receive_inventory(self, inventory:list[Item])->None:
+		#do other receiving stuff
+		await self.inventoryManager.receive(inventory)
+
+	def subscribe_customer_to_item(self, subscriber:Callable, item:Item):
+		delivered = False
+		async def func (data) :
+			nonlocal delivered
+			if delivered:
+				return
+			delivered = True
+			self.observer.unsubscribe(func, item.name)
+			if asyncio.iscoroutinefunction(subscriber):
+				await subscriber(data)
+			else:
+				await asyncio.get_running_loop().run_in_executor(None, subscriber, data)
+		self.observer.subscribe(func, item.name)
+
+
+
+async def run():
+	observer:AsyncObserver = AsyncObserver(max_concurrency=10, max_pending=100)
+	jake:Customer = Customer('Jake')
+	inventoryManager:InventoryManager = InventoryManager(observer)
+	store:Store = Store(observer, inventoryManager)
+	store.subscribe_customer_to_item(jake.get_widget, Item(ItemEnum.WIDGET))
+	observer.subscribe(log_cheese, ItemEnum.CHEESE)
+
+	inventory1 = [Item(ItemEnum.HAMMER), Item(ItemEnum.BASEBALL), Item(ItemEnum.CHEESE)]
+	inventory2 = [Item(ItemEnum.ROPE), Item(ItemEnum.CHEESE), Item(ItemEnum.WIDGET)]
+
+	start = time.perf_counter()
+	await store.receive_inventory(inventory1)
+	await store.receive_inventory(inventory2)
+	await store.receive_inventory(inventory2)
+	print('received everything in {:.3f}s'.format(time.perf_counter() - start))
+
+	await observer.join()
+	print('delivered everything in {:.3f}s'.format(time.perf_counter() - start))
+
+def main():
+	asyncio.run(run())
+
+if __name__ == "__main__":
+	main()
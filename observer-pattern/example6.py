@@ -0,0 +1,186 @@
+'''
+Going back to our synchronous observer from example 4,
+lets look at what happens when a really big shipment
+comes in.  InventoryManager.receive() calls notify()
+once for every single item.  A 50,000 line shipment
+means 50,000 Events created, 50,000 dictionary lookups
+and 50,000 calls to every subscriber.  Most of those
+items are the same thing over and over again.
+
+Instead we are going to batch the events.  The
+InventoryManager now groups the shipment by ItemEnum
+first, and then notifies the observer ONCE per kind
+of item, passing the whole list of matching items as
+the data.  Now a shipment costs one notification per
+distinct item, no matter how many items are in it.
+
+The observer itself did not have to change at all.
+It does not care what the data is, it just hands it
+to the subscribers.
+
+The subscribers on the other hand now receive a list
+instead of a single item.  We don't want to go and
+rewrite every existing callback, so we add a small
+per_item() function.  It takes a callback that expects
+a single item, and returns a new callback that takes a
+batch and calls the original once per item.  This is
+what we call a compatibility shim.
+
+The store's one-shot subscription is also updated.  The
+customer only wants one widget, so it passes just the
+first item of the batch along and unsubscribes.
+'''
+from typing import TypeVar, Callable, Generic
+from abc import ABC, abstractmethod
+from enum import Enum
+from dataclasses import dataclass
+
+
+T = TypeVar('T')
+
+class EventEnum(Enum):
+	INVENTORY = 'INVENTORY'
+
+class ItemEnum(Enum):
+	HAMMER ='HAMMER'
+	ROPE = 'ROPE'
+	WIDGET = 'WIDGET'
+	BASEBALL = 'BASEBALL'
+	CHEESE = 'CHEESE'
+
+
+@dataclass
+class Event(Generic[T]):
+	event:Enum
+	data:T
+
+class ObserverInterface(ABC):
+	@abstractmethod
+	def subscribe(self, subscriber:Callable, event:Enum)->None:pass
+	@abstractmethod
+	def unsubscribe(self, subscriber:Callable, event:Enum)->None:pass
+	@abstractmethod
+	def notify(self, event:Event)->None:pass
+
+class Observer(ObserverInterface):
+	_subscribers:dict[Enum, list[Callable]] = {}
+	dispatches:int = 0
+
+	def subscribe(self, subscriber:Callable, event:Enum)->None:
+		subs = self._subscribers.get(event)
+		if subs is not None:
+			subs.append(subscriber)
+		else:
+			self._subscribers[event] = [subscriber]
+
+	def unsubscribe(self, subscriber:Callable, event:Enum)->None:
+		subs = self._subscribers.get(event)
+		if subs is not None:
+			subs.remove(subscriber)
+			if len(subs)==0:
+				del self._subscribers[event]
+
+	def notify(self, event:Event)->None:
+		subscribers = self._subscribers.get(event.event)
+
+		if subscribers is not None:
+			for sub in subscribers:
+				self.dispatches += 1
+				sub(event.data)
+
+class Item:
+	def __init__(self, name:ItemEnum):
+		self.name = name
+
+def per_item(subscriber:Callable[[Item], None])->Callable[[list[Item]], None]:
+	def func(items:list[Item]):
+		for item in items:
+			subscriber(item)
+	return func
+
+class InventoryManagerInterface(ABC):
+	@abstractmethod
+	def receive(self, inventory:list[Item])->None:pass
+	@abstractmethod
+	def notify_items_received(self, name:ItemEnum, items:list[Item])->None:pass
+
+class InventoryManager(InventoryManagerInterface):
+	def __init__(self, observer:ObserverInterface):
+		self.observer = observer
+
+	def receive(self, inventory:list[Item])->None:
+		batches:dict[ItemEnum, list[Item]] = {}
+		for item in inventory:
+			#other receiving functions
+			batch = batches.get(item.name)
+			if batch is not None:
+				batch.append(item)
+			else:
+				batches[item.name] = [item]
+
+		for name, items in batches.items():
+			self.notify_items_received(name, items)
+
+	def notify_items_received(self, name:ItemEnum, items:list[Item])->None:
+		self.observer.notify(Event[list[Item]](name, items))
+
+class Customer:
+	def __init__(self, name:str):
+		self.name = name
+
+	def get_widget(self, item:Item):
+		print('Hey! my widget Arrived!!!')
+
+class CheeseCounter:
+	def __init__(self):
+		self.count = 0
+
+	def count_cheese(self, item:Item):
+		self.count += 1
+
+
+class Store:
+	def __init__(self, observer:ObserverInterface, inventoryManager:InventoryManagerInterface):
+		self.observer:ObserverInterface = observer
+		self.inventoryManager:InventoryManagerInterface  = inventoryManager
+
+	def receive_inventory(self, inventory:list[Item])->None:
+		#do other receiving stuff
+		self.inventoryManager.receive(inventory)
+
+	def subscribe_customer_to_item(self, subscriber:Callable, item:Item):
+		def func (items:list[Item]) :
+			subscriber(items[0])
+			self.observer.unsubscribe(func, item.name)
+		self.observer.subscribe(func, item.name)
+
+
+
+def main():
+	observer:Observer = Observer()
+	jake:Customer = Customer('Jake')
+	counter:CheeseCounter = CheeseCounter()
+	inventoryManager:InventoryManager = InventoryManager(observer)
+	store:Store = Store(observer, inventoryManager)
+	store.subscribe_customer_to_item(jake.get_widget, Item(ItemEnum.WIDGET))
+	#an old single item callback, wrapped in the shim
+	observer.subscribe(per_item(counter.count_cheese), ItemEnum.CHEESE)
+
+	inventory1 = [Item(ItemEnum.HAMMER), Item(ItemEnum.BASEBALL), Item(ItemEnum.CHEESE)]
+	inventory2 = [Item(ItemEnum.ROPE), Item(ItemEnum.CHEESE), Item(ItemEnum.WIDGET)]
+	store.receive_inventory(inventory1)
+	store.receive_inventory(inventory2)
+	store.receive_inventory(inventory2)
+
+	#a big shipment is still only one dispatch per kind of item
+	big_shipment = [Item(name) for name in ItemEnum for _ in range(10000)]
+	before = observer.dispatches
+	store.receive_inventory(big_shipment)
+	print('{} items received with {} dispatches'.format(
+		len(big_shipment), observer.dispatches - before
+	))
+	print('{} cheeses counted'.format(counter.count))
+
+
+if __name__ == "__main__":
+	main()
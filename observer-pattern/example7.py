@@ -0,0 +1,168 @@
+'''
+There are two sneaky bugs hiding in the Observer we have
+been using since example 2.
+
+1) _subscribers is declared on the class, not in the
+constructor.  That means EVERY Observer shares the exact
+same dictionary.  If you create two observers thinking
+they are separate, subscribing to one also subscribes
+to the other.
+
+2) notify() loops over the live list of subscribers.
+But the one-shot wrapper in Store.subscribe_customer_to_item
+calls unsubscribe() while that loop is running.  Removing
+an item from a list while looping over it shifts everything
+after it down one spot, so the loop skips the next
+subscriber.  If two customers are waiting for a widget,
+only the first one hears about it.
+
+We could fix the second bug by copying the list every time
+notify() is called, but notify() is called WAY more often
+than subscribe() or unsubscribe().  Copying on every event
+is a lot of wasted work.
+
+Instead we flip it around and copy when we write.  The
+subscribers for each event are now stored in a tuple.
+Tuples can't be changed, so subscribe() and unsubscribe()
+build a brand new tuple and swap it into the dictionary.
+notify() simply grabs whatever tuple is there and loops
+over it.  If someone unsubscribes in the middle of the
+loop, they replace the tuple in the dictionary, but the
+loop keeps going over the old one, which never changes.
+Nothing is copied and nothing is locked while notifying.
+
+This is called copy-on-write, and it works great when
+reads (notify) happen far more often than writes
+(subscribe / unsubscribe).
+
+The dictionary is also created in the constructor now, so
+each Observer has its own.
+'''
+from typing import TypeVar, Callable, Generic
+from abc import ABC, abstractmethod
+from enum import Enum
+from dataclasses import dataclass
+
+
+T = TypeVar('T')
+
+class EventEnum(Enum):
+	INVENTORY = 'INVENTORY'
+
+class ItemEnum(Enum):
+	HAMMER ='HAMMER'
+	ROPE = 'ROPE'
+	WIDGET = 'WIDGET'
+	BASEBALL = 'BASEBALL'
+	CHEESE = 'CHEESE'
+
+
+@dataclass
+class Event(Generic[T]):
+	event:Enum
+	data:T
+
+class ObserverInterface(ABC):
+	@abstractmethod
+	def subscribe(self, subscriber:Callable, event:Enum)->None:pass
+	@abstractmethod
+	def unsubscribe(self, subscriber:Callable, event:Enum)->None:pass
+	@abstractmethod
+	def notify(self, event:Event)->None:pass
+
+class Observer(ObserverInterface):
+	def __init__(self):
+		self._subscribers:dict[Enum, tuple[Callable, ...]] = {}
+
+	def subscribe(self, subscriber:Callable, event:Enum)->None:
+		subs = self._subscribers.get(event, ())
+		self._subscribers[event] = subs + (subscriber,)
+
+	def unsubscribe(self, subscriber:Callable, event:Enum)->None:
+		subs = self._subscribers.get(event)
+		if subs is not None:
+			index = subs.index(subscriber)
+			subs = subs[:index] + subs[index + 1:]
+			if len(subs)==0:
+				del self._subscribers[event]
+			else:
+				self._subscribers[event] = subs
+
+	def notify(self, event:Event)->None:
+		subscribers = self._subscribers.get(event.event)
+
+		if subscribers is not None:
+			for sub in subscribers:
+				sub(event.data)
+
+class Item:
+	def __init__(self, name:ItemEnum):
+		self.name = name
+
+class InventoryManagerInterface(ABC):
+	@abstractmethod
+	def receive(self, inventory:list[Item])->None:pass
+	@abstractmethod
+	def notify_item_received(self, item:Item)->None:pass
+
+class InventoryManager(InventoryManagerInterface):
+	def __init__(self, observer:ObserverInterface):
+		self.observer = observer
+
+	def receive(self, inventory:list[Item])->None:
+		for item in inventory:
+			#other receiving functions
+			self.notify_item_received(item)
+
+	def notify_item_received(self, item:Item)->None:
+		self.observer.notify(Event[Item](item.name, item))
+
+class Customer:
+	def __init__(self, name:str):
+		self.name = name
+
+	def get_widget(self, item:Item):
+		print('Hey! {}\'s widget Arrived!!!'.format(self.name))
+
+
+class Store:
+	def __init__(self, observer:ObserverInterface, inventoryManager:InventoryManagerInterface):
+		self.observer:ObserverInterface = observer
+		self.inventoryManager:InventoryManagerInterface  = inventoryManager
+
+	def receive_inventory(self, inventory:list[Item])->None:
+		#do other receiving stuff
+		self.inventoryManager.receive(inventory)
+
+	def subscribe_customer_to_item(self, subscriber:Callable, item:Item):
+		def func (data) :
+			subscriber(data)
+			self.observer.unsubscribe(func, item.name)
+		self.observer.subscribe(func, item.name)
+
+
+
+def main():
+	observer:Observer = Observer()
+	jake:Customer = Customer('Jake')
+	jill:Customer = Customer('Jill')
+	inventoryManager:InventoryManager = InventoryManager(observer)
+	store:Store = Store(observer, inventoryManager)
+	#both of these get notified now, and each only once
+	store.subscribe_customer_to_item(jake.get_widget, Item(ItemEnum.WIDGET))
+	store.subscribe_customer_to_item(jill.get_widget, Item(ItemEnum.WIDGET))
+
+	#a second store with its own observer does not see the first one's customers
+	other_observer:Observer = Observer()
+	other_store:Store = Store(other_observer, InventoryManager(other_observer))
+
+	inventory1 = [Item(ItemEnum.HAMMER), Item(ItemEnum.BASEBALL), Item(ItemEnum.CHEESE)]
+	inventory2 = [Item(ItemEnum.ROPE), Item(ItemEnum.CHEESE), Item(ItemEnum.WIDGET)]
+	other_store.receive_inventory(inventory2)
+	store.receive_inventory(inventory1)
+	store.receive_inventory(inventory2)
+	store.receive_inventory(inventory2)
+
+
+if __name__ == "__main__":
+	main()
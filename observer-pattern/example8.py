@@ -0,0 +1,224 @@
+'''
+The copy-on-write observer from example 7 is great when
+subscribers rarely change.  But look at what our store
+actually does.  Every customer waiting on a widget gets
+a one-shot subscription, and every one-shot subscription
+unsubscribes itself the moment the widget arrives.
+
+unsubscribe() has to find the subscriber before it can
+remove it, which means searching through every subscriber
+for that event.  If 20,000 customers are waiting on a
+widget, the widget arriving causes 20,000 unsubscribes,
+each searching up to 20,000 subscribers.  That is
+20,000 x 20,000 = 400,000,000 steps for ONE widget.
+
+To fix this we change two things.
+
+1) subscribe() now returns a token (just a number).
+The subscribers for each event are stored in a dictionary
+keyed by that token instead of in a list.  Python
+dictionaries remember the order things were added, so
+subscribers are still called in the order they subscribed,
+but now unsubscribe(token) can find and remove a subscriber
+in one step no matter how many there are.
+
+2) subscribe() takes a once flag.  The store no longer needs
+to wrap the customer's callback in a function that
+unsubscribes itself.  The observer knows which subscribers
+are one-shot, and after it finishes notifying everyone it
+removes all of them in one go.
+
+We can't change a dictionary while we are looping over it,
+so anything that subscribes or unsubscribes while notify()
+is running is marked, and then applied once the loop is
+done.  Unsubscribed subscribers are skipped right away, so
+nobody is called after they unsubscribe.
+'''
+from typing import TypeVar, Callable, Generic
+from abc import ABC, abstractmethod
+from enum import Enum
+from dataclasses import dataclass
+import itertools
+import time
+
+
+T = TypeVar('T')
+
+class EventEnum(Enum):
+	INVENTORY = 'INVENTORY'
+
+class ItemEnum(Enum):
+	HAMMER ='HAMMER'
+	ROPE = 'ROPE'
+	WIDGET = 'WIDGET'
+	BASEBALL = 'BASEBALL'
+	CHEESE = 'CHEESE'
+
+
+@dataclass
+class Event(Generic[T]):
+	event:Enum
+	data:T
+
+@dataclass
+class Subscription:
+	token:int
+	event:Enum
+	subscriber:Callable
+	once:bool = False
+	active:bool = True
+
+class ObserverInterface(ABC):
+	@abstractmethod
+	def subscribe(self, subscriber:Callable, event:Enum, once:bool=False)->int:pass
+	@abstractmethod
+	def unsubscribe(self, token:int)->None:pass
+	@abstractmethod
+	def notify(self, event:Event)->None:pass
+
+class Observer(ObserverInterface):
+	def __init__(self):
+		self._subscribers:dict[Enum, dict[int, Subscription]] = {}
+		self._subscriptions:dict[int, Subscription] = {}
+		self._tokens = itertools.count()
+		self._dispatching:int = 0
+		self._pending_adds:list[Subscription] = []
+		self._pending_removes:list[Subscription] = []
+
+	def subscribe(self, subscriber:Callable, event:Enum, once:bool=False)->int:
+		subscription = Subscription(next(self._tokens), event, subscriber, once)
+		self._subscriptions[subscription.token] = subscription
+		if self._dispatching:
+			self._pending_adds.append(subscription)
+		else:
+			self._add(subscription)
+		return subscription.token
+
+	def unsubscribe(self, token:int)->None:
+		subscription = self._subscriptions.pop(token, None)
+		if subscription is None or not subscription.active:
+			return
+		subscription.active = False
+		if self._dispatching:
+			self._pending_removes.append(subscription)
+		else:
+			self._remove(subscription)
+
+	def notify(self, event:Event)->None:
+		subscribers = self._subscribers.get(event.event)
+
+		if subscribers is not None:
+			self._dispatching += 1
+			try:
+				for subscription in subscribers.values():
+					if not subscription.active:
+						continue
+					if subscription.once:
+						subscription.active = False
+						self._subscriptions.pop(subscription.token, None)
+						self._pending_removes.append(subscription)
+					subscription.subscriber(event.data)
+			finally:
+				self._dispatching -= 1
+				if self._dispatching == 0:
+					self._apply_pending()
+
+	def _add(self, subscription:Subscription)->None:
+		subs = self._subscribers.get(subscription.event)
+		if subs is not None:
+			subs[subscription.token] = subscription
+		else:
+			self._subscribers[subscription.event] = {subscription.token: subscription}
+
+	def _remove(self, subscription:Subscription)->None:
+		subs = self._subscribers.get(subscription.event)
+		if subs is not None:
+			subs.pop(subscription.token, None)
+			if len(subs)==0:
+				del self._subscribers[subscription.event]
+
+	def _apply_pending(self)->None:
+		removes, self._pending_removes = self._pending_removes, []
+		for subscription in removes:
+			self._remove(subscription)
+		adds, self._pending_adds = self._pending_adds, []
+		for subscription in adds:
+			if subscription.active:
+				self._add(subscription)
+
+class Item:
+	def __init__(self, name:ItemEnum):
+		self.name = name
+
+class InventoryManagerInterface(ABC):
+	@abstractmethod
+	def receive(self, inventory:list[Item])->None:pass
+	@abstractmethod
+	def notify_item_received(self, item:Item)->None:pass
+
+class InventoryManager(InventoryManagerInterface):
+	def __init__(self, observer:ObserverInterface):
+		self.observer = observer
+
+	def receive(self, inventory:list[Item])->None:
+		for item in inventory:
+			#other receiving functions
+			self.notify_item_received(item)
+
+	def notify_item_received(self, item:Item)->None:
+		self.observer.notify(Event[Item](item.name, item))
+
+class Customer:
+	def __init__(self, name:str):
+		self.name = name
+		self.widgets = 0
+
+	def get_widget(self, item:Item):
+		self.widgets += 1
+
+
+class Store:
+	def __init__(self, observer:ObserverInterface, inventoryManager:InventoryManagerInterface):
+		self.observer:ObserverInterface = observer
+		self.inventoryManager:InventoryManagerInterface  = inventoryManager
+
+	def receive_inventory(self, inventory:list[Item])->None:
+		#do other receiving stuff
+		self.inventoryManager.receive(inventory)
+
+	def subscribe_customer_to_item(self, subscriber:Callable, item:Item)->int:
+		return self.observer.subscribe(subscriber, item.name, once=True)
+
+	def cancel_subscription(self, token:int)->None:
+		self.observer.unsubscribe(token)
+
+
+
+def main():
+	observer:Observer = Observer()
+	inventoryManager:InventoryManager = InventoryManager(observer)
+	store:Store = Store(observer, inventoryManager)
+
+	customers = [Customer('Customer {}'.format(i)) for i in range(20000)]
+	tokens = [
+		store.subscribe_customer_to_item(customer.get_widget, Item(ItemEnum.WIDGET))
+		for customer in customers
+	]
+	#one customer changed their mind
+	store.cancel_subscription(tokens[0])
+
+	inventory1 = [Item(ItemEnum.HAMMER), Item(ItemEnum.BASEBALL), Item(ItemEnum.CHEESE)]
+	inventory2 = [Item(ItemEnum.ROPE), Item(ItemEnum.CHEESE), Item(ItemEnum.WIDGET)]
+
+	start = time.perf_counter()
+	store.receive_inventory(inventory1)
+	store.receive_inventory(inventory2)
+	store.receive_inventory(inventory2)
+	print('notified {} customers in {:.3f}s'.format(
+		sum(customer.widgets for customer in customers),
+		time.perf_counter() - start
+	))
+
+
+if __name__ == "__main__":
+	main()
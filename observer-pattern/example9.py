@@ -0,0 +1,262 @@
+'''
+So far every observer has assumed there is only one
+thread.  In a real store there are several receiving
+docks, and each one calls Store.receive_inventory() at
+the same time from its own thread.  Our observers have
+no locking at all, so two docks subscribing and notifying
+at the same moment can corrupt the subscriber dictionary.
+On top of that the subscribers still run on the dock's
+thread, so a slow subscriber holds up the dock.
+
+The ThreadedObserver fixes both problems.
+
+Locking.  We keep the copy-on-write tuples from example 7.
+Since notify() only ever reads a tuple that never changes,
+it does not need a lock at all.  Only subscribe() and
+unsubscribe() take the lock, and only long enough to build
+and swap in the new tuple.  This is what we mean by a fine
+grained lock.  The docks never wait on each other just to
+notify.
+
+Worker pool.  Instead of calling the subscriber, notify()
+hands the call to a ThreadPoolExecutor.  How many threads
+the pool has is up to whoever creates the observer.
+
+Ordering.  If we just submitted every call to the pool,
+a subscriber could get the events out of order, or even
+be running twice at the same time on two threads.  So each
+subscriber gets its own Mailbox.  notify() drops the data
+into the mailbox, and if the mailbox is not already being
+worked on, submits ONE job to the pool that empties it in
+order.  A subscriber is only ever running on one thread at
+a time and always sees events in the order they were
+notified.  A nice side effect is the store's one-shot
+wrapper can keep a plain "already delivered" flag, because
+it is never called from two threads at once.
+
+flush() waits until every event that has been notified so
+far has been delivered.  join() flushes and then shuts the
+worker pool down, after that notify() raises RuntimeError.
+'''
+from typing import TypeVar, Callable, Generic
+from abc import ABC, abstractmethod
+from enum import Enum
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import threading
+import time
+
+
+T = TypeVar('T')
+
+class EventEnum(Enum):
+	INVENTORY = 'INVENTORY'
+
+class ItemEnum(Enum):
+	HAMMER ='HAMMER'
+	ROPE = 'ROPE'
+	WIDGET = 'WIDGET'
+	BASEBALL = 'BASEBALL'
+	CHEESE = 'CHEESE'
+
+
+@dataclass
+class Event(Generic[T]):
+	event:Enum
+	data:T
+
+class ObserverInterface(ABC):
+	@abstractmethod
+	def subscribe(self, subscriber:Callable, event:Enum)->None:pass
+	@abstractmethod
+	def unsubscribe(self, subscriber:Callable, event:Enum)->None:pass
+	@abstractmethod
+	def notify(self, event:Event)->None:pass
+	@abstractmethod
+	def flush(self, timeout:float|None=None)->bool:pass
+	@abstractmethod
+	def join(self)->None:pass
+
+class Mailbox:
+	def __init__(self, subscriber:Callable):
+		self.subscriber = subscriber
+		self.messages:deque = deque()
+		self.lock = threading.Lock()
+		self.running = False
+
+class ThreadedObserver(ObserverInterface):
+	def __init__(self, executor:ThreadPoolExecutor|None=None, max_workers:int=4):
+		self._subscribers:dict[Enum, tuple[Mailbox, ...]] = {}
+		self._lock = threading.Lock()
+		self._executor = executor if executor is not None else ThreadPoolExecutor(max_workers)
+		self._outstanding = 0
+		self._idle = threading.Condition()
+		self._closed = False
+
+	def subscribe(self, subscriber:Callable, event:Enum)->None:
+		with self._lock:
+			subs = self._subscribers.get(event, ())
+			self._subscribers[event] = subs + (Mailbox(subscriber),)
+
+	def unsubscribe(self, subscriber:Callable, event:Enum)->None:
+		with self._lock:
+			subs = self._subscribers.get(event)
+			if subs is not None:
+				subs = tuple(box for box in subs if box.subscriber != subscriber)
+				if len(subs)==0:
+					del self._subscribers[event]
+				else:
+					self._subscribers[event] = subs
+
+	def notify(self, event:Event)->None:
+		if self._closed:
+			raise RuntimeError('observer has been joined, it can not deliver any more events')
+		subscribers = self._subscribers.get(event.event)
+
+		if subscribers is not None:
+			with self._idle:
+				self._outstanding += len(subscribers)
+			for index, box in enumerate(subscribers):
+				with box.lock:
+					box.messages.append(event.data)
+					if box.running:
+						continue
+					box.running = True
+				try:
+					self._executor.submit(self._drain, box)
+				except BaseException:
+					#nobody is going to drain this mailbox or the ones after it, so take
+					#their messages back out of the count or flush() would wait forever
+					with box.lock:
+						dropped = len(box.messages)
+						box.messages.clear()
+						box.running = False
+					with self._idle:
+						self._outstanding -= dropped + len(subscribers) - index - 1
+						if self._outstanding == 0:
+							self._idle.notify_all()
+					raise
+
+	def flush(self, timeout:float|None=None)->bool:
+		with self._idle:
+			return self._idle.wait_for(lambda: self._outstanding == 0, timeout)
+
+	def join(self)->None:
+		self._closed = True
+		self.flush()
+		self._executor.shutdown()
+
+	def _drain(self, box:Mailbox)->None:
+		while True:
+			with box.lock:
+				if not box.messages:
+					box.running = False
+					return
+				data = box.messages.popleft()
+			try:
+				box.subscriber(data)
+			except Exception as e:
+				print('subscriber failed: {!r}'.format(e))
+			finally:
+				with self._idle:
+					self._outstanding -= 1
+					if self._outstanding == 0:
+						self._idle.notify_all()
+
+class Item:
+	def __init__(self, name:ItemEnum):
+		self.name = name
+
+class InventoryManagerInterface(ABC):
+	@abstractmethod
+	def receive(self, inventory:list[Item])->None:pass
+	@abstractmethod
+	def notify_item_received(self, item:Item)->None:pass
+
+class InventoryManager(InventoryManagerInterface):
+	def __init__(self, observer:ObserverInterface):
+		self.observer = observer
+
+	def receive(self, inventory:list[Item])->None:
+		for item in inventory:
+			#other receiving functions
+			self.notify_item_received(item)
+
+	def notify_item_received(self, item:Item)->None:
+		self.observer.notify(Event[Item](item.name, item))
+
+class Customer:
+	def __init__(self, name:str):
+		self.name = name
+
+	def get_widget(self, item:Item):
+		#pretend we are sending this customer an email
+		time.sleep(0.2)
+		print('Hey! my widget Arrived!!!')
+
+class CheeseLog:
+	def __init__(self):
+		self.entries:list[int] = []
+
+	def log(self, item:Item):
+		self.entries.append(item.serial)
+
+
+class Store:
+	def __init__(self, observer:ObserverInterface, inventoryManager:InventoryManagerInterface):
+		self.observer:ObserverInterface = observer
+		self.inventoryManager:InventoryManagerInterface  = inventoryManager
+
+	def receive_inventory(self, inventory:list[Item])->None:
+		#do other receiving stuff
+		self.inventoryManager.receive(inventory)
+
+	def subscribe_customer_to_item(self, subscriber:Callable, item:Item):
+		delivered = False
+		def func (data) :
+			nonlocal delivered
+			if delivered:
+				return
+			delivered = True
+			self.observer.unsubscribe(func, item.name)
+			subscriber(data)
+		self.observer.subscribe(func, item.name)
+
+
+
+def main():
+	observer:ThreadedObserver = ThreadedObserver(max_workers=4)
+	jake:Customer = Customer('Jake')
+	cheese_log:CheeseLog = CheeseLog()
+	inventoryManager:InventoryManager = InventoryManager(observer)
+	store:Store = Store(observer, inventoryManager)
+	store.subscribe_customer_to_item(jake.get_widget, Item(ItemEnum.WIDGET))
+	observer.subscribe(cheese_log.log, ItemEnum.CHEESE)
+
+	#one dock receives a steady stream of cheese, numbered in order
+	cheese = [Item(ItemEnum.CHEESE) for _ in range(1000)]
+	for serial, item in enumerate(cheese):
+		item.serial = serial
+	inventory = [Item(ItemEnum.ROPE), Item(ItemEnum.WIDGET), Item(ItemEnum.HAMMER)]
+
+	docks = [threading.Thread(target=store.receive_inventory, args=(cheese,))]
+	docks += [
+		threading.Thread(target=store.receive_inventory, args=(inventory,))
+		for _ in range(3)
+	]
+
+	start = time.perf_counter()
+	for dock in docks:
+		dock.start()
+	for dock in docks:
+		dock.join()
+	print('docks finished in {:.3f}s'.format(time.perf_counter() - start))
+
+	observer.join()
+	print('delivered everything in {:.3f}s'.format(time.perf_counter() - start))
+	print('cheese delivered in order: {}'.format(cheese_log.entries == list(range(1000))))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,131 @@
+from abc import ABC, abstractmethod
+from typing import Iterator, TypeVar
+import tracemalloc
+T = TypeVar('T')
+
+'''
+Now that the UserService only depends on the DatabaseInterface,
+lets look at what get_users() actually does with it.
+
+	1) db.get() pulls EVERY user out of the database into a list
+	2) then we build a second list with a UserObject for every one
+
+With a few users that is fine.  With millions of users, both
+lists are in memory at the same time, so memory peaks at twice
+the size of the whole user table.  And we can't start working
+on the first user until the very last one has been fetched.
+
+Instead we want to stream the users.  We add a cursor() method
+to the DatabaseInterface.  Rather than returning a list, it is a
+generator that yields one page (page_size rows) at a time.  Each
+database does this the way that suits it.  The SQL database asks
+for the next page of rows after the last id it saw (this is
+called keyset pagination, and unlike OFFSET it does not get
+slower the further in you go), and the document database uses
+its batch size.
+
+UserService gets a new iter_users() method, which is also a
+generator.  It asks the cursor for one page, turns each row into
+a UserObject, yields them one by one, and only then asks for the
+next page.  Only one page is ever in memory, no matter how many
+users there are, and the caller gets the first user as soon as
+the first page arrives.
+
+get_users() is still there for code that really does want a list.
+
+Because this example needs some rows to page through, the two
+databases make up fake rows instead of actually querying
+anything.
+'''
+
+class UserDatabaseResponseObject:
+	#raw data from the database
+	def __init__(self, id:int):
+		self.id = id
+
+class DatabaseInterface(ABC):
+	@abstractmethod
+	def get(self, query:dict, type:T)->list[T]:pass
+	@abstractmethod
+	def cursor(self, query:dict, type:T, page_size:int)->Iterator[list[T]]:pass
+
+class SqlDatabase(DatabaseInterface):
+	def __init__(self, rows:int=10):
+		#pretend this is how many rows are in the users table
+		self._rows = rows
+
+	def get(self, query:dict, type:T)->list[T]:
+		#SELECT * FROM users
+		return [type(id) for id in range(self._rows)]
+
+	def cursor(self, query:dict, type:T, page_size:int)->Iterator[list[T]]:
+		last_id = -1
+		while True:
+			#SELECT * FROM users WHERE id > :last_id ORDER BY id LIMIT :page_size
+			page = [type(id) for id in range(last_id + 1, min(last_id + 1 + page_size, self._rows))]
+			if not page:
+				return
+			yield page
+			last_id = page[-1].id
+
+class MongoDatabase(DatabaseInterface):
+	def __init__(self, documents:int=10):
+		self._documents = documents
+
+	def get(self, query:dict, type:T)->list[T]:
+		#db.users.find(query)
+		return [type(id) for id in range(self._documents)]
+
+	def cursor(self, query:dict, type:T, page_size:int)->Iterator[list[T]]:
+		#db.users.find(query).batch_size(page_size)
+		for start in range(0, self._documents, page_size):
+			yield [type(id) for id in range(start, min(start + page_size, self._documents))]
+
+class UserObject:
+	def __init__(self, data: UserDatabaseResponseObject):
+		#parse data into UserObject
+		self.id = data.id
+
+class UserService:
+	def __init__(self, database:DatabaseInterface):
+		self.db = database
+
+	def get_users(self)->list[UserObject]:
+		users = []
+		raw_users = self.db.get({}, UserDatabaseResponseObject)
+		for user in raw_users:
+			users.append(UserObject(user))
+
+		return users
+
+	def iter_users(self, page_size:int=1000)->Iterator[UserObject]:
+		for page in self.db.cursor({}, UserDatabaseResponseObject, page_size):
+			for user in page:
+				yield UserObject(user)
+
+def peak_memory(work)->int:
+	tracemalloc.start()
+	work()
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+	return peak
+
+def main():
+	sql = SqlDatabase(rows=200000)
+	service1 = UserService(sql)
+
+	def count_list():
+		return sum(1 for user in service1.get_users())
+
+	def count_stream():
+		return sum(1 for user in service1.iter_users(page_size=1000))
+
+	print('get_users() peak memory: {:,} bytes'.format(peak_memory(count_list)))
+	print('iter_users() peak memory: {:,} bytes'.format(peak_memory(count_stream)))
+
+	mongo = MongoDatabase(documents=25)
+	service2 = UserService(mongo)
+	print([user.id for user in service2.iter_users(page_size=10)])
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,256 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Hashable, Iterator, TypeVar
+import sys
+import threading
+import time
+T = TypeVar('T')
+
+'''
+Every call to get_users() goes all the way to the database,
+even if we asked the exact same question a second ago.  For hot
+queries, like "all active users", that is a lot of wasted trips.
+
+Because UserService only knows about the DatabaseInterface, we
+can put a cache in front of ANY database without changing either
+of them.  CachingDatabase is itself a DatabaseInterface that
+wraps another one (this is the decorator pattern).  UserService
+can't tell the difference.
+
+	database = CachingDatabase(SqlDatabase())
+	service = UserService(database)
+
+Keys.  Results are cached by (query, type).  The query is a dict,
+and dicts can't be used as keys, and {'a':1, 'b':2} and
+{'b':2, 'a':1} are the same query.  So the query is normalized
+first: it is turned into a tuple of sorted (key, value) pairs,
+and any dicts or lists inside it are normalized the same way.
+
+Limits.  The cache can't grow forever, so it has three limits:
+
+	ttl - a result is only used for this many seconds, after that
+		we go back to the database for a fresh copy.
+	max_entries - the most results it will hold.
+	max_bytes - roughly how much memory the results may use.
+
+Entries are kept in an OrderedDict.  Every time one is used it
+is moved to the end, so the least recently used (LRU) entry is
+always at the front.  When the cache is over either limit it
+throws away entries from the front until it fits again.  A
+result that is bigger than max_bytes on its own is never cached.
+
+Stampedes.  When a popular entry expires, every request that
+comes in before the database answers would miss the cache and
+send the same query to the database at the same time.  That is a
+stampede.  To stop it, the first request to miss is the only one
+that goes to the database (single-flight).  The others wait for
+its answer and share it.
+
+Invalidation.  When we know the data has changed, we don't want
+to wait for the ttl.  invalidate() drops a single query,
+invalidate_type() drops everything cached for a type, and
+clear() drops everything.
+
+Each caller gets its own copy of the cached list, so one caller
+adding or removing items can't change what the next one gets.
+cursor() is passed straight to the wrapped database, a stream is
+read once so there is nothing worth caching.
+'''
+
+class UserDatabaseResponseObject:
+	#raw data from the database
+	def __init__(self, id:int):
+		self.id = id
+
+class DatabaseInterface(ABC):
+	@abstractmethod
+	def get(self, query:dict, type:T)->list[T]:pass
+	@abstractmethod
+	def cursor(self, query:dict, type:T, page_size:int)->Iterator[list[T]]:pass
+
+class SqlDatabase(DatabaseInterface):
+	def __init__(self, rows:int=10, latency:float=0.05):
+		#pretend this is how many rows are in the users table, and how long a query takes
+		self._rows = rows
+		self._latency = latency
+		self.queries = 0
+
+	def get(self, query:dict, type:T)->list[T]:
+		#SELECT * FROM users
+		self.queries += 1
+		time.sleep(self._latency)
+		return [type(id) for id in range(self._rows)]
+
+	def cursor(self, query:dict, type:T, page_size:int)->Iterator[list[T]]:
+		last_id = -1
+		while True:
+			#SELECT * FROM users WHERE id > :last_id ORDER BY id LIMIT :page_size
+			page = [type(id) for id in range(last_id + 1, min(last_id + 1 + page_size, self._rows))]
+			if not page:
+				return
+			yield page
+			last_id = page[-1].id
+
+class CachingDatabase(DatabaseInterface):
+	def __init__(self, database:DatabaseInterface, ttl:float=60, max_entries:int=1024, max_bytes:int=64 * 1024 * 1024):
+		self.database = database
+		self.ttl = ttl
+		self.max_entries = max_entries
+		self.max_bytes = max_bytes
+		self.hits = 0
+		self.misses = 0
+		self.size = 0
+		#key -> (expires at, size in bytes, result)
+		self._entries:OrderedDict[Hashable, tuple[float, int, list]] = OrderedDict()
+		self._in_flight:dict[Hashable, Future] = {}
+		self._lock = threading.Lock()
+
+	def get(self, query:dict, type:T)->list[T]:
+		key = (self._normalize(query), type)
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is not None and entry[0] > time.monotonic():
+				self._entries.move_to_end(key)
+				self.hits += 1
+				return list(entry[2])
+			if entry is not None:
+				self._remove(key)
+
+			self.misses += 1
+			future = self._in_flight.get(key)
+			leader = future is None
+			if leader:
+				future = self._in_flight[key] = Future()
+
+		if not leader:
+			#someone is already asking the database, wait for their answer
+			return list(future.result())
+
+		try:
+			result = self.database.get(query, type)
+		except BaseException as e:
+			with self._lock:
+				del self._in_flight[key]
+			future.set_exception(e)
+			raise
+
+		with self._lock:
+			#if it was invalidated while we were querying, the result may be stale, so share it but don't keep it
+			if self._in_flight.pop(key, None) is future:
+				self._store(key, result)
+		future.set_result(result)
+		return list(result)
+
+	def __len__(self)->int:
+		return len(self._entries)
+
+	def cursor(self, query:dict, type:T, page_size:int)->Iterator[list[T]]:
+		return self.database.cursor(query, type, page_size)
+
+	def invalidate(self, query:dict, type:T)->None:
+		key = (self._normalize(query), type)
+		with self._lock:
+			self._in_flight.pop(key, None)
+			if key in self._entries:
+				self._remove(key)
+
+	def invalidate_type(self, type:T)->None:
+		with self._lock:
+			for key in [key for key in self._in_flight if key[1] is type]:
+				del self._in_flight[key]
+			for key in [key for key in self._entries if key[1] is type]:
+				self._remove(key)
+
+	def clear(self)->None:
+		with self._lock:
+			self._in_flight.clear()
+			self._entries.clear()
+			self.size = 0
+
+	def _store(self, key:Hashable, result:list)->None:
+		size = self._sizeof(result)
+		if size > self.max_bytes:
+			return
+		if key in self._entries:
+			self._remove(key)
+		self._entries[key] = (time.monotonic() + self.ttl, size, result)
+		self.size += size
+		while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+			self._remove(next(iter(self._entries)))
+
+	def _remove(self, key:Hashable)->None:
+		self.size -= self._entries.pop(key)[1]
+
+	@classmethod
+	def _normalize(cls, value)->Hashable:
+		if isinstance(value, dict):
+			return tuple(sorted((key, cls._normalize(item)) for key, item in value.items()))
+		if isinstance(value, (list, tuple)):
+			return tuple(cls._normalize(item) for item in value)
+		if isinstance(value, set):
+			return frozenset(cls._normalize(item) for item in value)
+		return value
+
+	@staticmethod
+	def _sizeof(result:list)->int:
+		#a rough estimate, the list plus every row and its attributes
+		size = sys.getsizeof(result)
+		for row in result:
+			size += sys.getsizeof(row)
+			attributes = getattr(row, '__dict__', None)
+			if attributes is not None:
+				size += sys.getsizeof(attributes) + sum(sys.getsizeof(value) for value in attributes.values())
+		return size
+
+class UserObject:
+	def __init__(self, data: UserDatabaseResponseObject):
+		#parse data into UserObject
+		self.id = data.id
+
+class UserService:
+	def __init__(self, database:DatabaseInterface):
+		self.db = database
+
+	def get_users(self, query:dict|None=None)->list[UserObject]:
+		users = []
+		raw_users = self.db.get(query or {}, UserDatabaseResponseObject)
+		for user in raw_users:
+			users.append(UserObject(user))
+
+		return users
+
+	def iter_users(self, page_size:int=1000)->Iterator[UserObject]:
+		for page in self.db.cursor({}, UserDatabaseResponseObject, page_size):
+			for user in page:
+				yield UserObject(user)
+
+def main():
+	sql = SqlDatabase(rows=1000)
+	cache = CachingDatabase(sql, ttl=0.5, max_bytes=1024 * 1024)
+	service = UserService(cache)
+
+	#the same query written two ways is one cache entry
+	service.get_users({'active': True, 'plan': 'pro'})
+	service.get_users({'plan': 'pro', 'active': True})
+	print('2 calls, {} database queries, {} hits'.format(sql.queries, cache.hits))
+
+	#20 requests arrive at once for a query that isn't cached yet
+	with ThreadPoolExecutor(max_workers=20) as pool:
+		list(pool.map(lambda _: service.get_users({'active': False}), range(20)))
+	print('20 concurrent calls, {} database queries in total'.format(sql.queries))
+
+	#the data changed, so drop everything cached for users
+	cache.invalidate_type(UserDatabaseResponseObject)
+	service.get_users({'active': True, 'plan': 'pro'})
+	print('after invalidate_type, {} database queries'.format(sql.queries))
+
+	#after the ttl the entry is fetched again
+	time.sleep(0.6)
+	service.get_users({'active': True, 'plan': 'pro'})
+	print('after ttl, {} database queries'.format(sql.queries))
+
+	print('{} entries using about {:,} bytes'.format(len(cache), cache.size))
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,209 @@
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, TypeVar
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+T = TypeVar('T')
+
+'''
+DatabaseInterface.get() blocks.  While it waits on the database,
+the thread that called it can't do anything else.  So a service
+that wants 200 queries in flight at the same time needs 200
+threads, and threads are expensive.
+
+With asyncio, one thread (the event loop) can keep hundreds of
+queries in flight.  While one query waits, the loop just works
+on another.  But that only works if the database calls never
+block, so we need an async version of the strategy:
+
+	AsyncDatabaseInterface - the same idea as DatabaseInterface,
+		but get() is a coroutine and cursor() is an async generator.
+	AsyncUserService - the same as UserService, but awaits the
+		database.
+
+UserService doesn't change shape at all, it just awaits.  And
+just like before, AsyncUserService has no idea which database it
+is talking to.
+
+AsyncSqlDatabase is backed by a real SQLite file.  The sqlite3
+module only has a blocking api, so every query is handed to a
+thread pool with run_in_executor() and the event loop awaits the
+result.  The blocking happens on the pool's threads, never on
+the loop.  SQLite connections can't be shared between threads,
+so every pool thread opens its own, the first time it is used.
+The database keeps track of them, and close() closes them all
+once the pool has finished.
+
+AsyncDocumentDatabase stands in for a document database like
+Mongo with a real async driver.  Those talk to the server over
+the network without blocking, so there is no thread pool, the
+"network round trip" is just an asyncio.sleep().
+
+main() runs 200 queries one after the other, and then all 200 at
+once with asyncio.gather(), against both databases.
+'''
+
+class UserDatabaseResponseObject:
+	#raw data from the database
+	def __init__(self, id:int, name:str):
+		self.id = id
+		self.name = name
+
+class AsyncDatabaseInterface(ABC):
+	@abstractmethod
+	async def get(self, query:dict, type:T)->list[T]:pass
+	@abstractmethod
+	def cursor(self, query:dict, type:T, page_size:int)->AsyncIterator[list[T]]:pass
+
+class AsyncSqlDatabase(AsyncDatabaseInterface):
+	def __init__(self, path:str, max_workers:int=32, latency:float=0.01):
+		self.path = path
+		#pretend every query takes this long on a real server
+		self._latency = latency
+		self._local = threading.local()
+		#every connection the pool threads have opened, so close() can close them all
+		self._connections:list[sqlite3.Connection] = []
+		self._connections_lock = threading.Lock()
+		self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+	def close(self)->None:
+		#wait for running queries first, then nothing is using the connections any more
+		self._executor.shutdown()
+		with self._connections_lock:
+			connections, self._connections = self._connections, []
+		for db in connections:
+			db.close()
+
+	async def get(self, query:dict, type:T)->list[T]:
+		where, params = self._where(query)
+		rows = await self._run('SELECT id, name FROM users' + where + ' ORDER BY id', params)
+		return [type(*row) for row in rows]
+
+	async def cursor(self, query:dict, type:T, page_size:int)->AsyncIterator[list[T]]:
+		where, params = self._where(query)
+		where += ' AND id > ?' if where else ' WHERE id > ?'
+		last_id = -1
+		while True:
+			rows = await self._run('SELECT id, name FROM users' + where + ' ORDER BY id LIMIT ?', params + [last_id, page_size])
+			if not rows:
+				return
+			yield [type(*row) for row in rows]
+			last_id = rows[-1][0]
+
+	async def _run(self, sql:str, params:list)->list[tuple]:
+		loop = asyncio.get_running_loop()
+		return await loop.run_in_executor(self._executor, self._execute, sql, params)
+
+	def _execute(self, sql:str, params:list)->list[tuple]:
+		#runs on a pool thread, so blocking here is fine
+		db = getattr(self._local, 'db', None)
+		if db is None:
+			#only this thread uses it, but close() closes it from another thread
+			db = self._local.db = sqlite3.connect(self.path, check_same_thread=False)
+			with self._connections_lock:
+				self._connections.append(db)
+		time.sleep(self._latency)
+		return db.execute(sql, params).fetchall()
+
+	@staticmethod
+	def _where(query:dict)->tuple[str, list]:
+		if not query:
+			return '', []
+		#column names can't be parameters, so only allow the ones we know about
+		for column in query:
+			if column not in ('id', 'name'):
+				raise ValueError('unknown column {}'.format(column))
+		return ' WHERE ' + ' AND '.join('{} = ?'.format(column) for column in query), list(query.values())
+
+class AsyncDocumentDatabase(AsyncDatabaseInterface):
+	def __init__(self, documents:list[dict], latency:float=0.01):
+		self._documents = documents
+		#pretend every round trip to the server takes this long
+		self._latency = latency
+
+	async def get(self, query:dict, type:T)->list[T]:
+		#await db.users.find(query).to_list()
+		await asyncio.sleep(self._latency)
+		return [type(**document) for document in self._documents if self._matches(document, query)]
+
+	async def cursor(self, query:dict, type:T, page_size:int)->AsyncIterator[list[T]]:
+		#async for document in db.users.find(query).batch_size(page_size)
+		matches = [document for document in self._documents if self._matches(document, query)]
+		for start in range(0, len(matches), page_size):
+			await asyncio.sleep(self._latency)
+			yield [type(**document) for document in matches[start:start + page_size]]
+
+	@staticmethod
+	def _matches(document:dict, query:dict)->bool:
+		return all(document.get(key) == value for key, value in query.items())
+
+class UserObject:
+	def __init__(self, data: UserDatabaseResponseObject):
+		#parse data into UserObject
+		self.id = data.id
+		self.name = data.name
+
+class AsyncUserService:
+	def __init__(self, database:AsyncDatabaseInterface):
+		self.db = database
+
+	async def get_users(self, query:dict|None=None)->list[UserObject]:
+		users = []
+		raw_users = await self.db.get(query or {}, UserDatabaseResponseObject)
+		for user in raw_users:
+			users.append(UserObject(user))
+
+		return users
+
+	async def iter_users(self, page_size:int=1000)->AsyncIterator[UserObject]:
+		async for page in self.db.cursor({}, UserDatabaseResponseObject, page_size):
+			for user in page:
+				yield UserObject(user)
+
+def create_users_table(path:str, users:list[dict])->None:
+	db = sqlite3.connect(path)
+	with db:
+		db.execute('CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT NOT NULL)')
+		db.executemany('INSERT INTO users (id, name) VALUES (:id, :name)', users)
+	db.close()
+
+async def compare(name:str, service:AsyncUserService, requests:int)->None:
+	start = time.perf_counter()
+	for id in range(requests):
+		await service.get_users({'id': id})
+	sequential = time.perf_counter() - start
+
+	start = time.perf_counter()
+	results = await asyncio.gather(*(service.get_users({'id': id}) for id in range(requests)))
+	concurrent = time.perf_counter() - start
+
+	assert [users[0].id for users in results] == list(range(requests))
+	print('{:<9} {} queries one at a time: {:.3f}s, all at once: {:.3f}s'.format(name, requests, sequential, concurrent))
+
+async def run():
+	users = [{'id': id, 'name': 'user {}'.format(id)} for id in range(1000)]
+	path = os.path.join(tempfile.mkdtemp(), 'users.db')
+	create_users_table(path, users)
+
+	sql = AsyncSqlDatabase(path)
+	document = AsyncDocumentDatabase(users)
+	try:
+		await compare('sql', AsyncUserService(sql), 200)
+		await compare('document', AsyncUserService(document), 200)
+
+		count = 0
+		async for user in AsyncUserService(sql).iter_users(page_size=100):
+			count += 1
+		print('streamed {} users from sql'.format(count))
+	finally:
+		sql.close()
+
+def main():
+	asyncio.run(run())
+
+if __name__ == "__main__":
+	main()
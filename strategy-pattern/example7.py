@@ -0,0 +1,421 @@
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Generic, Iterator, TypeVar
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+T = TypeVar('T')
+C = TypeVar('C')
+
+'''
+Until now SqlDatabase has just pretended to query something.  A
+real one needs a connection, and the simplest thing to do is open
+a new one in every get().  Opening a connection is slow though.
+For a database server it means a network handshake and a login,
+and even SQLite has to open the file and read its schema.  When
+that happens for every query, it can take longer than the query.
+
+A connection pool opens connections once and hands them out again
+and again.  get() borrows a connection, runs its query, and gives
+it back for the next caller.
+
+ConnectionPool doesn't know anything about SQL.  It is given a
+connect() function that opens a new connection, so any
+DatabaseInterface can use it for whatever kind of connection it
+has.  It has a few settings:
+
+	min_size - connections opened up front and always kept open,
+		so the first queries don't have to wait.
+	max_size - the most connections open at once.  When they are
+		all busy, callers wait for one to be given back.
+	timeout - how long a caller will wait for a connection before
+		giving up with a PoolTimeout, instead of hanging forever.
+	max_idle - connections that haven't been used for this many
+		seconds are closed, as long as there are more than
+		min_size.  A burst of traffic opens lots of connections,
+		and this lets the pool shrink again afterwards.
+	health_check - called on a connection before it is handed out.
+		If it fails (a server restarted, a network blip), the
+		connection is thrown away and another one is used.
+
+Idle connections are kept in a deque, and the most recently
+returned one is handed out first.  That way a few connections do
+most of the work and stay warm, and the rest sit at the other end
+of the deque until they are old enough to be closed.
+
+Opening a connection and health checks both happen outside the
+pool's lock, so one slow connect() doesn't hold up everyone else.
+
+stats() returns a snapshot of what the pool has been doing, so we
+can see if it is sized right.  Lots of timeouts or a long
+average wait means max_size is too small.
+
+SqlDatabase is now backed by a real SQLite file, so main() can
+compare opening a connection for every query against using a pool.
+'''
+
+class PoolTimeout(TimeoutError):
+	pass
+
+@dataclass
+class PoolStats:
+	size:int
+	idle:int
+	in_use:int
+	waiting:int
+	created:int
+	closed:int
+	acquired:int
+	timeouts:int
+	failed_health_checks:int
+	average_wait:float
+
+class ConnectionPool(Generic[C]):
+	def __init__(
+		self,
+		connect:Callable[[], C],
+		close:Callable[[C], None]=lambda connection: connection.close(),
+		health_check:Callable[[C], bool]|None=None,
+		min_size:int=1,
+		max_size:int=10,
+		timeout:float=5,
+		max_idle:float=300
+	):
+		if not 0 <= min_size <= max_size or max_size < 1:
+			raise ValueError('need 0 <= min_size <= max_size and max_size >= 1')
+		self._connect = connect
+		self._close = close
+		self._health_check = health_check
+		self.min_size = min_size
+		self.max_size = max_size
+		self.timeout = timeout
+		self.max_idle = max_idle
+
+		#(connection, time it was given back), most recently returned on the right
+		self._idle:deque[tuple[C, float]] = deque()
+		self._waiting = 0
+		self._closed = False
+		self._available = threading.Condition()
+
+		self._created = 0
+		self._closed_count = 0
+		self._acquired = 0
+		self._timeouts = 0
+		self._failed_health_checks = 0
+		self._wait_time = 0.0
+
+		self._size = min_size
+		for _ in range(min_size):
+			self._idle.append((self._open(), time.monotonic()))
+
+	@contextmanager
+	def connection(self, timeout:float|None=None)->Iterator[C]:
+		connection = self.acquire(timeout)
+		try:
+			yield connection
+		except BaseException:
+			#we don't know what state it was left in, so don't hand it to anyone else
+			self.release(connection, broken=True)
+			raise
+		self.release(connection)
+
+	def acquire(self, timeout:float|None=None)->C:
+		timeout = self.timeout if timeout is None else timeout
+		start = time.monotonic()
+		self.evict_idle()
+		deadline = start + timeout
+		while True:
+			connection = self._take(deadline, timeout)
+			if connection is not None:
+				if self._healthy(connection):
+					break
+				self._discard(connection)
+				continue
+			#nothing idle, but there is room to open a new one
+			try:
+				connection = self._open()
+			except BaseException:
+				with self._available:
+					self._size -= 1
+					self._available.notify()
+				raise
+			break
+
+		with self._available:
+			self._acquired += 1
+			self._wait_time += time.monotonic() - start
+		return connection
+
+	def release(self, connection:C, broken:bool=False)->None:
+		if broken:
+			self._discard(connection)
+			return
+		with self._available:
+			closed = self._closed
+			if not closed:
+				self._idle.append((connection, time.monotonic()))
+				evicted = self._evict_idle()
+				self._available.notify()
+		if closed:
+			self._discard(connection)
+			return
+		for stale in evicted:
+			self._close(stale)
+
+	def evict_idle(self)->int:
+		with self._available:
+			evicted = self._evict_idle()
+		#closing can be slow, so do it after letting go of the lock
+		for connection in evicted:
+			self._close(connection)
+		return len(evicted)
+
+	def close(self)->None:
+		with self._available:
+			self._closed = True
+			idle = [connection for connection, _ in self._idle]
+			self._idle.clear()
+			self._available.notify_all()
+		for connection in idle:
+			self._discard(connection)
+
+	def stats(self)->PoolStats:
+		with self._available:
+			return PoolStats(
+				size=self._size,
+				idle=len(self._idle),
+				in_use=self._size - len(self._idle),
+				waiting=self._waiting,
+				created=self._created,
+				closed=self._closed_count,
+				acquired=self._acquired,
+				timeouts=self._timeouts,
+				failed_health_checks=self._failed_health_checks,
+				average_wait=self._wait_time / self._acquired if self._acquired else 0.0
+			)
+
+	def _take(self, deadline:float, timeout:float)->C|None:
+		#returns an idle connection, or None after reserving a slot for a new one
+		with self._available:
+			while True:
+				if self._closed:
+					raise RuntimeError('pool is closed')
+				if self._idle:
+					return self._idle.pop()[0]
+				if self._size < self.max_size:
+					self._size += 1
+					return None
+
+				remaining = deadline - time.monotonic()
+				if remaining <= 0:
+					self._timeouts += 1
+					raise PoolTimeout('no connection available after {:.2f}s'.format(timeout))
+				self._waiting += 1
+				try:
+					self._available.wait(remaining)
+				finally:
+					self._waiting -= 1
+
+	def _evict_idle(self)->list[C]:
+		#takes stale connections out of the pool, the caller closes them once the lock is released
+		#the least recently used are on the left, stop at the first one that is still fresh
+		cutoff = time.monotonic() - self.max_idle
+		evicted = []
+		while self._idle and self._size > self.min_size and self._idle[0][1] < cutoff:
+			evicted.append(self._idle.popleft()[0])
+			self._size -= 1
+			self._closed_count += 1
+		return evicted
+
+	def _open(self)->C:
+		#the caller has already counted this connection in _size
+		connection = self._connect()
+		with self._available:
+			self._created += 1
+		return connection
+
+	def _healthy(self, connection:C)->bool:
+		if self._health_check is None:
+			return True
+		try:
+			if self._health_check(connection):
+				return True
+		except Exception:
+			pass
+		with self._available:
+			self._failed_health_checks += 1
+		return False
+
+	def _discard(self, connection:C)->None:
+		try:
+			self._close(connection)
+		finally:
+			with self._available:
+				self._size -= 1
+				self._closed_count += 1
+				self._available.notify()
+
+class UserDatabaseResponseObject:
+	#raw data from the database
+	def __init__(self, id:int, name:str):
+		self.id = id
+		self.name = name
+
+class DatabaseInterface(ABC):
+	@abstractmethod
+	def get(self, query:dict, type:T)->list[T]:pass
+	@abstractmethod
+	def cursor(self, query:dict, type:T, page_size:int)->Iterator[list[T]]:pass
+
+def sqlite_connect(path:str)->Callable[[], sqlite3.Connection]:
+	def connect()->sqlite3.Connection:
+		#pooled connections move between threads, the pool makes sure only one uses it at a time
+		return sqlite3.connect(path, check_same_thread=False)
+	return connect
+
+def sqlite_health_check(connection:sqlite3.Connection)->bool:
+	return connection.execute('SELECT 1').fetchone() == (1,)
+
+def users_where(query:dict)->tuple[str, list]:
+	if not query:
+		return '', []
+	#column names can't be parameters, so only allow the ones we know about
+	for column in query:
+		if column not in ('id', 'name'):
+			raise ValueError('unknown column {}'.format(column))
+	return ' WHERE ' + ' AND '.join('{} = ?'.format(column) for column in query), list(query.values())
+
+class SqlDatabase(DatabaseInterface):
+	def __init__(self, pool:ConnectionPool[sqlite3.Connection]):
+		self.pool = pool
+
+	def get(self, query:dict, type:T)->list[T]:
+		where, params = users_where(query)
+		with self.pool.connection() as db:
+			rows = db.execute('SELECT id, name FROM users' + where + ' ORDER BY id', params).fetchall()
+		return [type(*row) for row in rows]
+
+	def cursor(self, query:dict, type:T, page_size:int)->Iterator[list[T]]:
+		where, params = users_where(query)
+		where += ' AND id > ?' if where else ' WHERE id > ?'
+		last_id = -1
+		while True:
+			#only hold a connection while fetching a page, not while the caller works on it
+			with self.pool.connection() as db:
+				rows = db.execute('SELECT id, name FROM users' + where + ' ORDER BY id LIMIT ?', params + [last_id, page_size]).fetchall()
+			if not rows:
+				return
+			yield [type(*row) for row in rows]
+			last_id = rows[-1][0]
+
+
+class UnpooledSqlDatabase(DatabaseInterface):
+	#what we had before, a new connection for every query
+	def __init__(self, path:str):
+		self.path = path
+
+	def get(self, query:dict, type:T)->list[T]:
+		where, params = users_where(query)
+		rows = self._execute('SELECT id, name FROM users' + where + ' ORDER BY id', params)
+		return [type(*row) for row in rows]
+
+	def cursor(self, query:dict, type:T, page_size:int)->Iterator[list[T]]:
+		where, params = users_where(query)
+		where += ' AND id > ?' if where else ' WHERE id > ?'
+		last_id = -1
+		while True:
+			rows = self._execute('SELECT id, name FROM users' + where + ' ORDER BY id LIMIT ?', params + [last_id, page_size])
+			if not rows:
+				return
+			yield [type(*row) for row in rows]
+			last_id = rows[-1][0]
+
+	def _execute(self, sql:str, params:list)->list[tuple]:
+		db = sqlite3.connect(self.path)
+		try:
+			return db.execute(sql, params).fetchall()
+		finally:
+			db.close()
+
+class UserObject:
+	def __init__(self, data: UserDatabaseResponseObject):
+		#parse data into UserObject
+		self.id = data.id
+		self.name = data.name
+
+class UserService:
+	def __init__(self, database:DatabaseInterface):
+		self.db = database
+
+	def get_users(self, query:dict|None=None)->list[UserObject]:
+		users = []
+		raw_users = self.db.get(query or {}, UserDatabaseResponseObject)
+		for user in raw_users:
+			users.append(UserObject(user))
+
+		return users
+
+	def iter_users(self, page_size:int=1000)->Iterator[UserObject]:
+		for page in self.db.cursor({}, UserDatabaseResponseObject, page_size):
+			for user in page:
+				yield UserObject(user)
+
+def create_users_table(path:str, rows:int)->None:
+	db = sqlite3.connect(path)
+	with db:
+		db.execute('PRAGMA journal_mode=WAL')
+		db.execute('CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT NOT NULL)')
+		db.executemany('INSERT INTO users (id, name) VALUES (?, ?)', ((id, 'user {}'.format(id)) for id in range(rows)))
+	db.close()
+
+def benchmark(name:str, service:UserService, requests:int, threads:int)->None:
+	start = time.perf_counter()
+	with ThreadPoolExecutor(max_workers=threads) as executor:
+		list(executor.map(lambda id: service.get_users({'id': id % 10000}), range(requests)))
+	seconds = time.perf_counter() - start
+	print('{:<28} {:>8,.0f} queries/sec'.format(name, requests / seconds))
+
+def main():
+	path = os.path.join(tempfile.mkdtemp(), 'users.db')
+	create_users_table(path, 10000)
+
+	pool = ConnectionPool(
+		sqlite_connect(path),
+		health_check=sqlite_health_check,
+		min_size=2,
+		max_size=4,
+		timeout=1,
+		max_idle=0.2
+	)
+	benchmark('new connection per query', UserService(UnpooledSqlDatabase(path)), 20000, 8)
+	benchmark('connection pool (max 4)', UserService(SqlDatabase(pool)), 20000, 8)
+	print(pool.stats())
+
+	#after a quiet spell the pool shrinks back to min_size
+	time.sleep(0.3)
+	print('evicted {} idle connections'.format(pool.evict_idle()))
+
+	#hold every connection so the next caller times out
+	held = [pool.acquire() for _ in range(pool.max_size)]
+	try:
+		pool.acquire(timeout=0.1)
+	except PoolTimeout as e:
+		print('timed out: {}'.format(e))
+	for connection in held:
+		pool.release(connection)
+
+	#a connection that has gone bad is replaced instead of handed out
+	broken = pool.acquire()
+	broken.close()
+	pool.release(broken)
+	print('{} users, after replacing a bad connection'.format(sum(1 for user in UserService(SqlDatabase(pool)).iter_users(page_size=500))))
+	print(pool.stats())
+	pool.close()
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,278 @@
+from abc import ABC, abstractmethod
+from array import array
+from typing import Iterator, Sequence, TypeVar
+import os
+import sqlite3
+import tempfile
+import time
+try:
+	import numpy
+except ImportError:
+	numpy = None
+T = TypeVar('T')
+
+'''
+For a big result, most of get_users() isn't spent in the database
+at all.  It is spent in the python loop that calls UserObject(user)
+once for every row.  Every one of those is a new python object,
+with its own __dict__, holding its own boxed ints and floats.
+
+For analytics, like "what is the average balance of all users",
+we don't care about individual users.  We care about whole
+columns.  So we are going to add a second, column-oriented way of
+getting data out of a database.
+
+get_columns() is a new method on the DatabaseInterface.  Instead
+of a list of rows, it returns one array per field:
+
+	{'id': [1, 2, 3], 'age': [31, 25, 47], 'balance': [...]}
+
+Each database builds these columns however suits it best.  The
+important part is that numbers are stored in typed arrays.  An
+array of a million ints is one block of memory, not a million
+int objects.  If NumPy is installed the columns are NumPy arrays,
+and sum() and mean() run in C.  NumPy is optional though.  If it
+is missing, the stdlib array module is used instead, which is
+still compact, and sum() is still done in C by the builtin.
+
+The schema says which fields to fetch and how to store them: 'q'
+for ints, 'd' for floats and None for anything else (like names),
+which just stays a list.
+
+SqlDatabase never holds the whole result as rows.  It reads the
+cursor chunk_size rows at a time with fetchmany() and appends
+each chunk straight onto one array per column.  When it is done,
+NumPy just wraps those arrays without copying them.
+
+UserService gets a get_user_batch() method, which returns a
+UserBatch.  A UserBatch holds the columns and lets you use them
+directly:
+
+	batch.column('balance')
+	batch.mean('balance')
+
+It can also be used like a list of users.  batch[5] or iterating
+over it gives a UserRow, a tiny view that just remembers the
+batch and its position, and reads each field from the columns
+when you ask for it.  Rows are only created when you look at
+them, so code that only uses columns never creates any.
+
+get_users() is still there, for code that really wants UserObjects.
+'''
+
+COLUMN_TYPES = {'q': 'int64', 'd': 'float64'}
+
+def to_column(values:Sequence, typecode:str|None)->Sequence:
+	if typecode is None:
+		return list(values)
+	if numpy is not None:
+		return numpy.fromiter(values, dtype=COLUMN_TYPES[typecode], count=len(values))
+	return array(typecode, values)
+
+def new_buffer(typecode:str|None)->array|list:
+	return array(typecode) if typecode is not None else []
+
+def from_buffer(buffer:array|list, typecode:str|None)->Sequence:
+	#numpy can use the array's memory as it is, nothing is copied
+	if typecode is not None and numpy is not None:
+		return numpy.frombuffer(buffer, dtype=COLUMN_TYPES[typecode])
+	return buffer
+
+class UserDatabaseResponseObject:
+	#raw data from the database
+	def __init__(self, id:int, name:str, age:int, balance:float):
+		self.id = id
+		self.name = name
+		self.age = age
+		self.balance = balance
+
+class DatabaseInterface(ABC):
+	@abstractmethod
+	def get(self, query:dict, type:T)->list[T]:pass
+	@abstractmethod
+	def get_columns(self, query:dict, schema:dict[str, str|None])->dict[str, Sequence]:pass
+
+class SqlDatabase(DatabaseInterface):
+	def __init__(self, path:str, chunk_size:int=10000):
+		self.path = path
+		self.chunk_size = chunk_size
+
+	def get(self, query:dict, type:T)->list[T]:
+		where, params = self._where(query)
+		rows = self._execute('SELECT id, name, age, balance FROM users' + where + ' ORDER BY id', params)
+		return [type(*row) for row in rows]
+
+	def get_columns(self, query:dict, schema:dict[str, str|None])->dict[str, Sequence]:
+		where, params = self._where(query)
+		fields = list(schema)
+		self._check_columns(fields)
+		buffers = [new_buffer(schema[field]) for field in fields]
+		db = sqlite3.connect(self.path)
+		try:
+			cursor = db.execute('SELECT {} FROM users{} ORDER BY id'.format(', '.join(fields), where), params)
+			#only chunk_size rows exist as tuples at a time, each chunk is
+			#transposed with zip() (in C) and appended to the column buffers
+			while True:
+				rows = cursor.fetchmany(self.chunk_size)
+				if not rows:
+					break
+				for buffer, values in zip(buffers, zip(*rows)):
+					buffer.extend(values)
+		finally:
+			db.close()
+		return {field: from_buffer(buffer, schema[field]) for field, buffer in zip(fields, buffers)}
+
+	def _execute(self, sql:str, params:list)->list[tuple]:
+		db = sqlite3.connect(self.path)
+		try:
+			return db.execute(sql, params).fetchall()
+		finally:
+			db.close()
+
+	@classmethod
+	def _where(cls, query:dict)->tuple[str, list]:
+		if not query:
+			return '', []
+		cls._check_columns(query)
+		return ' WHERE ' + ' AND '.join('{} = ?'.format(column) for column in query), list(query.values())
+
+	@staticmethod
+	def _check_columns(columns)->None:
+		#column names can't be parameters, so only allow the ones we know about
+		for column in columns:
+			if column not in ('id', 'name', 'age', 'balance'):
+				raise ValueError('unknown column {}'.format(column))
+
+class MongoDatabase(DatabaseInterface):
+	def __init__(self, documents:list[dict]):
+		self._documents = documents
+
+	def get(self, query:dict, type:T)->list[T]:
+		#db.users.find(query)
+		return [type(**document) for document in self._find(query)]
+
+	def get_columns(self, query:dict, schema:dict[str, str|None])->dict[str, Sequence]:
+		#db.users.find(query, projection)
+		documents = self._find(query)
+		return {field: to_column([document[field] for document in documents], typecode) for field, typecode in schema.items()}
+
+	def _find(self, query:dict)->list[dict]:
+		return [document for document in self._documents if all(document.get(key) == value for key, value in query.items())]
+
+class UserObject:
+	def __init__(self, data: UserDatabaseResponseObject):
+		#parse data into UserObject
+		self.id = data.id
+		self.name = data.name
+		self.age = data.age
+		self.balance = data.balance
+
+class UserRow:
+	#looks like a UserObject, but reads its fields out of the batch's columns
+	__slots__ = ('_columns', '_index')
+
+	def __init__(self, columns:dict[str, Sequence], index:int):
+		self._columns = columns
+		self._index = index
+
+	def __getattr__(self, name:str):
+		try:
+			return self._columns[name][self._index]
+		except KeyError:
+			raise AttributeError(name) from None
+
+	def __repr__(self)->str:
+		return 'UserRow({})'.format(', '.join('{}={!r}'.format(field, column[self._index]) for field, column in self._columns.items()))
+
+class UserBatch:
+	SCHEMA = {'id': 'q', 'name': None, 'age': 'q', 'balance': 'd'}
+
+	def __init__(self, columns:dict[str, Sequence]):
+		self._columns = columns
+		self._length = len(next(iter(columns.values()))) if columns else 0
+
+	def __len__(self)->int:
+		return self._length
+
+	def __getitem__(self, index:int)->UserRow:
+		if index < 0:
+			index += self._length
+		if not 0 <= index < self._length:
+			raise IndexError('batch index out of range')
+		return UserRow(self._columns, index)
+
+	def __iter__(self)->Iterator[UserRow]:
+		columns = self._columns
+		for index in range(self._length):
+			yield UserRow(columns, index)
+
+	def fields(self)->list[str]:
+		return list(self._columns)
+
+	def column(self, field:str)->Sequence:
+		return self._columns[field]
+
+	def sum(self, field:str):
+		column = self._columns[field]
+		return column.sum() if numpy is not None and isinstance(column, numpy.ndarray) else sum(column)
+
+	def mean(self, field:str)->float:
+		if not self._length:
+			raise ValueError('mean of an empty batch')
+		return float(self.sum(field)) / self._length
+
+class UserService:
+	def __init__(self, database:DatabaseInterface):
+		self.db = database
+
+	def get_users(self, query:dict|None=None)->list[UserObject]:
+		users = []
+		raw_users = self.db.get(query or {}, UserDatabaseResponseObject)
+		for user in raw_users:
+			users.append(UserObject(user))
+
+		return users
+
+	def get_user_batch(self, query:dict|None=None, fields:list[str]|None=None)->UserBatch:
+		schema = UserBatch.SCHEMA if fields is None else {field: UserBatch.SCHEMA[field] for field in fields}
+		return UserBatch(self.db.get_columns(query or {}, schema))
+
+def create_users(rows:int)->list[dict]:
+	return [{'id': id, 'name': 'user {}'.format(id), 'age': 18 + id % 60, 'balance': (id * 37 % 10000) / 100} for id in range(rows)]
+
+def create_users_table(path:str, users:list[dict])->None:
+	db = sqlite3.connect(path)
+	with db:
+		db.execute('CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT NOT NULL, age INTEGER NOT NULL, balance REAL NOT NULL)')
+		db.executemany('INSERT INTO users (id, name, age, balance) VALUES (:id, :name, :age, :balance)', users)
+	db.close()
+
+def compare(name:str, service:UserService)->None:
+	start = time.perf_counter()
+	users = service.get_users()
+	average = sum(user.balance for user in users) / len(users)
+	objects = time.perf_counter() - start
+
+	start = time.perf_counter()
+	batch = service.get_user_batch(fields=['balance'])
+	assert abs(batch.mean('balance') - average) < 1e-6
+	columns = time.perf_counter() - start
+
+	print('{:<6} average balance {:.2f}, UserObjects: {:.3f}s, columns: {:.3f}s'.format(name, average, objects, columns))
+
+def main():
+	print('columns are {}'.format('numpy arrays' if numpy is not None else 'stdlib arrays, numpy is not installed'))
+	users = create_users(500000)
+	path = os.path.join(tempfile.mkdtemp(), 'users.db')
+	create_users_table(path, users)
+
+	compare('sql', UserService(SqlDatabase(path)))
+	compare('mongo', UserService(MongoDatabase(users)))
+
+	#rows are only made when you look at them
+	batch = UserService(SqlDatabase(path)).get_user_batch({'age': 30})
+	print('{} users aged 30, first is {!r}'.format(len(batch), batch[0]))
+	print('their names start with {}'.format([row.name for row, _ in zip(batch, range(3))]))
+
+if __name__ == "__main__":
+	main()